@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Headless HTTP/JSON recommendation API, separate from the Streamlit UI.
+
+    python api_server.py --port 8000
+    python api_server.py --load-test --requests 2000 --concurrency 32
+"""
+
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from catalog_reloader import CatalogReloader, get_shared_reloader
+from facet_index import normalize_constraints
+
+
+class RecommendationServer(HTTPServer):
+    """HTTP server handing connections to a bounded worker pool."""
+
+    # Listen backlog; the worker pool and queue limit decide what gets served
+    request_queue_size = 128
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        reloader: CatalogReloader,
+        workers: int = 8,
+        queue_size: int = 32,
+    ):
+        super().__init__(address, RecommendationRequestHandler)
+        self.reloader = reloader
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="api-worker"
+        )
+        # Requests being processed plus requests waiting for a worker
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._stats_lock = threading.Lock()
+        self.accepted = 0
+        self.rejected = 0
+
+    def process_request(self, request, client_address) -> None:
+        """Queue the connection for a worker, or reject it when saturated."""
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self.rejected += 1
+            self._reject(request)
+            self.shutdown_request(request)
+            return
+
+        with self._stats_lock:
+            self.accepted += 1
+        self._executor.submit(self._process_in_worker, request, client_address)
+
+    def server_close(self) -> None:
+        """Close the socket and wait for in-flight requests."""
+        super().server_close()
+        self._executor.shutdown(wait=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return backpressure statistics for metrics reporting."""
+        with self._stats_lock:
+            return {"accepted": self.accepted, "rejected": self.rejected}
+
+    def _process_in_worker(self, request, client_address) -> None:
+        """Handle one connection on a pool thread."""
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def _reject(self, request) -> None:
+        """Answer 503 without involving a worker."""
+        body = json.dumps({"error": "Server is busy, please retry"}).encode("utf-8")
+        try:
+            # Drain whatever already arrived so closing the socket is less
+            # likely to reset it, without ever waiting on the accept thread
+            request.setblocking(False)
+            try:
+                request.recv(65536)
+            except BlockingIOError:
+                pass
+            request.sendall(
+                b"HTTP/1.0 503 Service Unavailable\r\n"
+                b"Content-Type: application/json\r\n"
+                b"Retry-After: 1\r\n"
+                + f"Content-Length: {len(body)}\r\n\r\n".encode("ascii")
+                + body
+            )
+        except OSError:
+            pass
+
+
+class RecommendationRequestHandler(BaseHTTPRequestHandler):
+    """Route JSON requests to the current engine snapshot."""
+
+    server: RecommendationServer
+
+    def do_GET(self) -> None:
+        """Handle health, metrics, hotel lookup and review search."""
+        self._dispatch(self._route_get)
+
+    def do_POST(self) -> None:
+        """Handle basic, structured and enhanced recommendation requests."""
+        self._dispatch(self._route_post)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Silence per-request logging; use /metrics instead."""
+
+    def _dispatch(self, route: Callable[[], None]) -> None:
+        """Run a route, answering 500 instead of dropping the connection."""
+        try:
+            route()
+        except Exception as e:
+            print(f"API error on {self.command} {self.path}: {e!r}")
+            self._send_json(500, {"error": "Internal server error"})
+
+    def _route_get(self) -> None:
+        """GET routes."""
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        engine = self.server.reloader.current()
+
+        if url.path == "/health":
+            self._send_json(
+                200, {"status": "ok", "version": self.server.reloader.version}
+            )
+        elif url.path == "/metrics":
+            metrics = engine.get_metrics()
+            metrics["server"] = self.server.get_stats()
+            metrics["catalog"] = self.server.reloader.get_status()
+            self._send_json(200, metrics)
+        elif url.path == "/hotels":
+            # Optional facet filters, e.g. ?min_stars=4&amenities=pool,spa
+            constraints = {}
+            for key, values in query.items():
+                value = values[0]
+                if key in ("amenities", "features"):
+                    constraints[key] = [v for v in value.split(",") if v]
+                elif key in ("min_stars", "max_stars", "min_price", "max_price"):
+                    constraints[key] = int(value) if value.isdigit() else value
+                else:
+                    constraints[key] = value
+            try:
+                hotels = engine.filter_hotels(**constraints)
+            except ValueError as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            self._send_json(
+                200,
+                {"hotels": [{"id": h["id"], "name": h["name"]} for h in hotels]},
+            )
+        elif url.path.startswith("/hotels/"):
+            hotel_id = url.path[len("/hotels/") :]
+            hotel = engine.get_hotel(hotel_id)
+            if hotel is None:
+                self._send_json(404, {"error": f"Unknown hotel: {hotel_id}"})
+            else:
+                self._send_json(
+                    200, {"hotel": hotel, "review_stats": engine.review_stats[hotel_id]}
+                )
+        elif url.path == "/reviews/search":
+            text = query.get("q", [""])[0]
+            if not text.strip():
+                self._send_json(400, {"error": "Missing query parameter: q"})
+                return
+            try:
+                min_rating = query.get("min_rating", [None])[0]
+                min_rating = int(min_rating) if min_rating else None
+                limit = int(query.get("limit", ["20"])[0])
+            except ValueError:
+                self._send_json(400, {"error": "min_rating and limit must be integers"})
+                return
+            if limit <= 0:
+                self._send_json(400, {"error": "limit must be a positive integer"})
+                return
+            results = engine.search_reviews(
+                text,
+                hotel_id=query.get("hotel_id", [None])[0],
+                min_rating=min_rating,
+                limit=limit,
+            )
+            self._send_json(200, {"results": results})
+        else:
+            self._send_json(404, {"error": f"Not found: {url.path}"})
+
+    def _route_post(self) -> None:
+        """POST routes."""
+        url = urlparse(self.path)
+        body = self._read_json()
+        if body is None:
+            return
+        engine = self.server.reloader.current()
+
+        preferences = body.get("preferences")
+        if not isinstance(preferences, str) or not preferences.strip():
+            self._send_json(400, {"error": "Field 'preferences' is required"})
+            return
+        timeout = body.get("timeout")
+        if timeout is not None and (
+            not isinstance(timeout, (int, float)) or timeout <= 0
+        ):
+            self._send_json(400, {"error": "Field 'timeout' must be a positive number"})
+            return
+        constraints = body.get("constraints") or {}
+        try:
+            if not isinstance(constraints, dict):
+                raise ValueError("Field 'constraints' must be an object")
+            normalize_constraints(constraints)
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        if url.path == "/recommendations/basic":
+            result = engine.get_basic_recommendations(
+                preferences, timeout=timeout, constraints=constraints
+            )
+            self._send_json(200, {"recommendations": result})
+        elif url.path == "/recommendations/structured":
+            top_k = body.get("top_k")
+            if top_k is not None and (
+                not isinstance(top_k, int) or isinstance(top_k, bool) or top_k <= 0
+            ):
+                self._send_json(
+                    400, {"error": "Field 'top_k' must be a positive integer"}
+                )
+                return
+            result = engine.get_structured_recommendations(
+                preferences, top_k=top_k, timeout=timeout, constraints=constraints
+            )
+            self._send_json(200, {"recommendations": result})
+        elif url.path == "/recommendations/enhanced":
+            basic = body.get("basic_recommendations")
+            if not isinstance(basic, str):
+                basic = engine.get_basic_recommendations(
+                    preferences, timeout=timeout, constraints=constraints
+                )
+            result = engine.get_enhanced_recommendations(
+                preferences, basic, timeout=timeout, constraints=constraints
+            )
+            self._send_json(
+                200, {"basic_recommendations": basic, "recommendations": result}
+            )
+        else:
+            self._send_json(404, {"error": f"Not found: {url.path}"})
+
+    def _read_json(self) -> Optional[Dict[str, Any]]:
+        """Parse the JSON request body, answering 400 when it is invalid."""
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, json.JSONDecodeError):
+            self._send_json(400, {"error": "Request body must be valid JSON"})
+            return None
+        if not isinstance(body, dict):
+            self._send_json(400, {"error": "Request body must be a JSON object"})
+            return None
+        return body
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        """Write a JSON response."""
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+LOAD_TEST_PREFERENCES = [
+    "I like hotels near mountains, with quiet environment, suitable for hiking",
+    "I need a hotel with convenient transportation, close to city center",
+    "I want a beachfront resort with beach access and water sports facilities",
+    "I prefer hotels with historical and cultural character",
+    "I need a hotel near the airport with shuttle service",
+]
+
+LOAD_TEST_REVIEW_QUERIES = [
+    "mountain+views",
+    "quiet+rooms",
+    "beach+access",
+    "airport+shuttle",
+    "friendly+staff",
+]
+
+
+def run_load_test(args: argparse.Namespace) -> None:
+    """Measure throughput against an in-process server on the local ranking path."""
+    reloader = CatalogReloader(args.data, args.config)
+    # Force the offline path so the test never reaches the real API
+    reloader.current().llm_client.api_key = None
+
+    server = RecommendationServer(
+        ("127.0.0.1", 0), reloader, workers=args.workers, queue_size=args.queue_size
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def send(i: int) -> Tuple[int, float]:
+        if i % 5 == 3:
+            request = urllib.request.Request(f"{base_url}/hotels/hotel_00{i % 9 + 1}")
+        elif i % 5 == 4:
+            review_query = LOAD_TEST_REVIEW_QUERIES[i % len(LOAD_TEST_REVIEW_QUERIES)]
+            request = urllib.request.Request(
+                f"{base_url}/reviews/search?q={review_query}"
+            )
+        else:
+            # Vary the wording so each request exercises the ranking path
+            preferences = (
+                f"{LOAD_TEST_PREFERENCES[i % len(LOAD_TEST_PREFERENCES)]} #{i}"
+            )
+            request = urllib.request.Request(
+                f"{base_url}/recommendations/basic",
+                data=json.dumps({"preferences": preferences}).encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+            )
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except (urllib.error.URLError, OSError):
+            status = 0
+        return status, time.perf_counter() - started
+
+    print(
+        f"Load test: {args.requests} requests, concurrency {args.concurrency}, "
+        f"{args.workers} workers, queue {args.queue_size}"
+    )
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(send, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    server.shutdown()
+    server.server_close()
+
+    statuses: Dict[int, int] = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    latencies = sorted(latency for status, latency in results if status == 200)
+
+    def percentile(p: float) -> float:
+        if not latencies:
+            return 0.0
+        return latencies[min(int(p / 100 * len(latencies)), len(latencies) - 1)] * 1000
+
+    print(f"Elapsed: {elapsed:.2f}s, throughput: {len(results) / elapsed:.1f} req/s")
+    print(f"Status codes: {dict(sorted(statuses.items()))}")
+    print(
+        f"Latency (200s): p50 {percentile(50):.1f} ms, "
+        f"p95 {percentile(95):.1f} ms, p99 {percentile(99):.1f} ms"
+    )
+
+
+def main() -> None:
+    """Start the API server or run the load test."""
+    parser = argparse.ArgumentParser(description="Hotel recommendation HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=8, help="worker threads")
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=32,
+        help="requests allowed to wait for a worker before answering 503",
+    )
+    parser.add_argument("--data", default="hotel_data.json")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument(
+        "--load-test", action="store_true", help="run an offline load test and exit"
+    )
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    if args.load_test:
+        run_load_test(args)
+        return
+
+    server = RecommendationServer(
+        (args.host, args.port),
+        get_shared_reloader(args.data, args.config),
+        workers=args.workers,
+        queue_size=args.queue_size,
+    )
+    print(f"🏨 Recommendation API listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 API server stopped.")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,5 @@
 import streamlit as st
-import json
-from recommendation_engine import RecommendationEngine
+from catalog_reloader import get_shared_reloader
 
 # Page configuration
 st.set_page_config(
@@ -12,10 +11,12 @@ st.set_page_config(
 
 # (Sidebar uses default Streamlit style; no custom CSS applied)
 
-# Initialize session state
-if "recommendation_engine" not in st.session_state:
-    st.session_state.recommendation_engine = RecommendationEngine()
+# Take one engine snapshot per rerun; the shared reloader swaps in a rebuilt
+# engine in the background when hotel_data.json or config.json change
+catalog_reloader = get_shared_reloader()
+engine = catalog_reloader.current()
 
+# Initialize session state
 if "basic_recommendations" not in st.session_state:
     st.session_state.basic_recommendations = None
 
@@ -41,8 +42,7 @@ with st.sidebar:
 
     # Display current configuration
     try:
-        with open("config.json", "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = engine.llm_client.config
 
         st.subheader("Current Configuration")
         st.write(f"**LLM Provider**: {config.get('llm_provider', 'deepseek')}")
@@ -51,7 +51,7 @@ with st.sidebar:
         api_key = config.get("deepseek_api_key", "")
         if api_key == "YOUR_DEEPSEEK_API_KEY_HERE":
             st.warning("⚠️ Please configure your API key in config.json")
-            st.info("💡 Currently using simulation response mode")
+            st.info("💡 Currently using local ranking mode")
         else:
             st.success("✅ API key configured")
 
@@ -62,12 +62,27 @@ with st.sidebar:
 
     # Hotel data summary
     st.subheader("📊 Data Overview")
-    hotels = st.session_state.recommendation_engine.hotels
+    hotels = engine.hotels
     st.write(f"**Number of Hotels**: {len(hotels)}")
 
     total_reviews = sum(len(hotel.get("reviews", [])) for hotel in hotels)
     st.write(f"**Total Reviews**: {total_reviews}")
 
+    # Runtime metrics
+    with st.expander("📈 Performance Metrics"):
+        metrics = engine.get_metrics()
+        cache_stats = metrics["preference_cache"]
+        st.write(f"**Cache Hit Rate**: {cache_stats['hit_rate'] * 100:.1f}%")
+        st.write(
+            f"**Cache Hits / Misses**: {cache_stats['hits']} / {cache_stats['misses']}"
+        )
+        st.write(f"**Near-Duplicate Hits**: {cache_stats['similar_hits']}")
+        st.write(f"**LLM Circuit Breaker**: {metrics['llm']['breaker']['state']}")
+        st.write(f"**Local Fallbacks**: {metrics['llm']['fallbacks']}")
+        st.write(f"**Catalog Version**: {catalog_reloader.version}")
+        if catalog_reloader.last_error:
+            st.warning(f"Last catalog reload failed: {catalog_reloader.last_error}")
+
     # Show hotel list with clickable names
     with st.expander("View All Hotels"):
         for hotel in hotels:
@@ -266,6 +281,35 @@ else:
         st.session_state.user_preferences = selected_example
         st.rerun()
 
+    # Hard constraints are applied exactly before any hotel reaches the LLM
+    with st.expander("🎛️ Hard Constraints (Optional)"):
+        facet_values = engine.facet_index.facet_values()
+        col1, col2 = st.columns(2)
+        with col1:
+            min_stars = st.selectbox(
+                "Minimum Star Rating",
+                [None] + facet_values["star_rating"],
+                format_func=lambda stars: "Any" if stars is None else f"{stars}⭐",
+            )
+            required_amenities = st.multiselect(
+                "Required Amenities", facet_values["amenities"]
+            )
+        with col2:
+            max_price = st.selectbox(
+                "Maximum Price Range",
+                [None] + facet_values["price_range"],
+                format_func=lambda level: "Any" if level is None else "$" * level,
+            )
+            required_features = st.multiselect(
+                "Required Features", facet_values["features"]
+            )
+    constraints = {
+        "min_stars": min_stars,
+        "max_price": max_price,
+        "amenities": required_amenities,
+        "features": required_features,
+    }
+
     st.header("🔍 Recommendations")
 
     # First recommendation button
@@ -279,9 +323,16 @@ else:
                 "Analyzing your requirements and generating recommendations..."
             ):
                 try:
-                    basic_rec = st.session_state.recommendation_engine.get_basic_recommendations(
-                        user_preferences
-                    )
+                    if engine.structured_output:
+                        # Compact JSON from the LLM, rendered to markdown here
+                        items = engine.get_structured_recommendations(
+                            user_preferences, constraints=constraints
+                        )
+                        basic_rec = engine.local_ranker.render_structured(items)
+                    else:
+                        basic_rec = engine.get_basic_recommendations(
+                            user_preferences, constraints=constraints
+                        )
                     st.session_state.basic_recommendations = basic_rec
                     st.success("Basic recommendations generated!")
                 except Exception as e:
@@ -298,8 +349,10 @@ else:
                 "Completing hotel information and optimizing recommendations..."
             ):
                 try:
-                    enhanced_rec = st.session_state.recommendation_engine.get_enhanced_recommendations(
-                        user_preferences, st.session_state.basic_recommendations
+                    enhanced_rec = engine.get_enhanced_recommendations(
+                        user_preferences,
+                        st.session_state.basic_recommendations,
+                        constraints=constraints,
                     )
                     st.session_state.enhanced_recommendations = enhanced_rec
                     st.success("Enhanced recommendations generated!")
@@ -0,0 +1,155 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from recommendation_engine import RecommendationEngine
+from review_digest import digest_path_for
+
+
+class CatalogReloader:
+    """Watch the catalog and config files and swap in a rebuilt engine."""
+
+    def __init__(
+        self,
+        data_path: str = "hotel_data.json",
+        config_path: str = "config.json",
+        poll_interval: float = 2.0,
+        engine_factory: Callable[[str, str], Any] = RecommendationEngine,
+    ):
+        """Build the first engine snapshot synchronously."""
+        self.data_path = data_path
+        self.config_path = config_path
+        self.poll_interval = poll_interval
+        self.engine_factory = engine_factory
+
+        self._fingerprints = {
+            path: self._fingerprint(path, None) for path in self._watched_paths()
+        }
+        self._engine = engine_factory(data_path, config_path)
+        self._reload_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.version = 1
+        self.reload_count = 0
+        self.last_reload_at = time.time()
+        self.last_error: Optional[str] = None
+
+    def current(self) -> Any:
+        """Return the current engine snapshot.
+
+        Callers should fetch it once per request and keep using that object,
+        so a concurrent reload never changes state under them.
+        """
+        return self._engine
+
+    def start(self) -> None:
+        """Start polling the watched files in a background thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._watch, name="catalog-reloader", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background polling thread."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1)
+            self._thread = None
+
+    def check_now(self) -> bool:
+        """Reload if any watched file changed; return whether a swap happened."""
+        with self._reload_lock:
+            fingerprints = {}
+            changed = False
+            for path in self._watched_paths():
+                previous = self._fingerprints.get(path)
+                fingerprints[path] = self._fingerprint(path, previous)
+                if previous is None or fingerprints[path][2] != previous[2]:
+                    changed = True
+            if not changed:
+                self._fingerprints.update(fingerprints)
+                return False
+
+            # Build the new snapshot off the request path; the old engine keeps
+            # serving until the single reference assignment below
+            try:
+                engine = self.engine_factory(self.data_path, self.config_path)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"Catalog reload failed, keeping previous snapshot: {e}")
+                # Remember the broken version so it is not retried every poll
+                self._fingerprints.update(fingerprints)
+                return False
+
+            self._fingerprints.update(fingerprints)
+            self._engine = engine
+            self.version += 1
+            self.reload_count += 1
+            self.last_reload_at = time.time()
+            self.last_error = None
+            return True
+
+    def get_status(self) -> Dict[str, Any]:
+        """Return reload statistics for metrics reporting."""
+        return {
+            "version": self.version,
+            "reload_count": self.reload_count,
+            "last_reload_at": self.last_reload_at,
+            "last_error": self.last_error,
+            "watching": self._thread is not None and self._thread.is_alive(),
+        }
+
+    def _watch(self) -> None:
+        """Poll the watched files until stopped."""
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.check_now()
+            except Exception as e:
+                print(f"Catalog watcher error: {e}")
+
+    def _watched_paths(self) -> Tuple[str, str, str]:
+        """Files whose changes trigger a reload."""
+        return (self.data_path, self.config_path, digest_path_for(self.data_path))
+
+    def _fingerprint(
+        self, path: str, previous: Optional[Tuple[int, int, str]]
+    ) -> Tuple[int, int, str]:
+        """Return (mtime, size, content hash) of a file.
+
+        The hash is only recomputed when mtime or size moved, so polling stays
+        cheap; reloads are decided on the hash, so a plain ``touch`` does not
+        trigger a rebuild.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return (0, 0, "")
+        if previous and previous[:2] == (stat.st_mtime_ns, stat.st_size):
+            return previous
+        with open(path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        return (stat.st_mtime_ns, stat.st_size, digest)
+
+
+_shared_reloader: Optional[CatalogReloader] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_reloader(
+    data_path: str = "hotel_data.json", config_path: str = "config.json"
+) -> CatalogReloader:
+    """Return the process-wide reloader, creating and starting it on first use."""
+    global _shared_reloader
+    if _shared_reloader is None:
+        with _shared_lock:
+            if _shared_reloader is None:
+                reloader = CatalogReloader(data_path, config_path)
+                reloader.start()
+                _shared_reloader = reloader
+    return _shared_reloader
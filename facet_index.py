@@ -0,0 +1,160 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Tag keys indexed as their own facets rather than as boolean features
+VALUE_FACETS = ("star_rating", "price_range", "amenities")
+
+CONSTRAINT_KEYS = (
+    "min_stars",
+    "max_stars",
+    "min_price",
+    "max_price",
+    "amenities",
+    "features",
+)
+
+
+def price_level(value: Any) -> int:
+    """Price level of a ``"$$$"`` string or an integer level."""
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid price level: {value!r}")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value and set(value) == {"$"}:
+        return len(value)
+    raise ValueError(f"Invalid price level: {value!r}")
+
+
+def normalize_constraints(constraints: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate hard constraints and bring them into a canonical form.
+
+    Empty values are dropped, prices become integer levels and amenity and
+    feature lists are sorted, so equal constraints compare (and cache) equal.
+    """
+    normalized = {}
+    for key, value in constraints.items():
+        if key not in CONSTRAINT_KEYS:
+            raise ValueError(f"Unknown constraint: {key}")
+        if value is None or value == [] or value == "":
+            continue
+        if key in ("min_stars", "max_stars"):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{key} must be a number")
+            normalized[key] = value
+        elif key in ("min_price", "max_price"):
+            normalized[key] = price_level(value)
+        else:
+            if isinstance(value, str):
+                value = [value]
+            if not all(isinstance(item, str) for item in value):
+                raise ValueError(f"{key} must be a list of strings")
+            normalized[key] = sorted(set(value))
+    return normalized
+
+
+class FacetIndex:
+    """Bitmap indexes over hotel tags for exact constraint filtering.
+
+    Every hotel owns one bit position; each facet value maps to an integer
+    bitmap of the hotels carrying it, so a filter is a handful of ORs and ANDs.
+    """
+
+    def __init__(self):
+        self._slots: Dict[str, int] = {}
+        self._ids_by_slot: List[Optional[str]] = []
+        self._all = 0
+        self._stars: Dict[Any, int] = {}
+        self._prices: Dict[int, int] = {}
+        self._amenities: Dict[str, int] = {}
+        self._features: Dict[str, int] = {}
+        # Facet entries per hotel, so an update can clear the old bits
+        self._entries: Dict[str, List[Tuple[Dict, Any]]] = {}
+
+    def add(self, hotel: Dict) -> None:
+        """Insert or re-index a hotel."""
+        hotel_id = hotel["id"]
+        self.remove(hotel_id)
+
+        slot = self._slots.get(hotel_id)
+        if slot is None:
+            slot = len(self._ids_by_slot)
+            self._slots[hotel_id] = slot
+            self._ids_by_slot.append(hotel_id)
+        bit = 1 << slot
+
+        tags = hotel.get("tags", {})
+        entries = []
+        if "star_rating" in tags:
+            entries.append((self._stars, tags["star_rating"]))
+        if tags.get("price_range"):
+            entries.append((self._prices, len(tags["price_range"])))
+        for amenity in tags.get("amenities", []):
+            entries.append((self._amenities, amenity))
+        for key, value in tags.items():
+            if key not in VALUE_FACETS and value is True:
+                entries.append((self._features, key))
+
+        for bitmaps, value in entries:
+            bitmaps[value] = bitmaps.get(value, 0) | bit
+        self._entries[hotel_id] = entries
+        self._all |= bit
+
+    def remove(self, hotel_id: str) -> None:
+        """Clear a hotel's bits; its slot is kept for a later re-add."""
+        entries = self._entries.pop(hotel_id, None)
+        if entries is None:
+            return
+        mask = ~(1 << self._slots[hotel_id])
+        for bitmaps, value in entries:
+            bitmaps[value] &= mask
+            if not bitmaps[value]:
+                del bitmaps[value]
+        self._all &= mask
+
+    def filter(
+        self,
+        min_stars: Optional[float] = None,
+        max_stars: Optional[float] = None,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        amenities: Iterable[str] = (),
+        features: Iterable[str] = (),
+    ) -> List[str]:
+        """Ids of hotels satisfying every constraint, in insertion order."""
+        result = self._all
+        if min_stars is not None or max_stars is not None:
+            result &= self._union(self._stars, min_stars, max_stars)
+        if min_price is not None or max_price is not None:
+            result &= self._union(self._prices, min_price, max_price)
+        for amenity in amenities:
+            result &= self._amenities.get(amenity, 0)
+        for feature in features:
+            result &= self._features.get(feature, 0)
+        return self._decode(result)
+
+    def facet_values(self) -> Dict[str, List[Any]]:
+        """Values present in the catalog for every facet, e.g. for UI widgets."""
+        return {
+            "star_rating": sorted(self._stars),
+            "price_range": sorted(self._prices),
+            "amenities": sorted(self._amenities),
+            "features": sorted(self._features),
+        }
+
+    def _union(
+        self, bitmaps: Dict[Any, int], low: Optional[float], high: Optional[float]
+    ) -> int:
+        """Bitmap of hotels whose facet value lies within [low, high]."""
+        result = 0
+        for value, bitmap in bitmaps.items():
+            if (low is None or value >= low) and (high is None or value <= high):
+                result |= bitmap
+        return result
+
+    def _decode(self, bitmap: int) -> List[str]:
+        """Hotel ids of the set bits, lowest slot first."""
+        ids = []
+        while bitmap:
+            lowest = bitmap & -bitmap
+            ids.append(self._ids_by_slot[lowest.bit_length() - 1])
+            bitmap ^= lowest
+        return ids
@@ -0,0 +1,67 @@
+import math
+from typing import Dict, List, Set, Tuple
+
+KM_PER_DEGREE = 111.32
+
+
+class GeoGridIndex:
+    """Grid of 1-degree cells for finding hotels within a radius."""
+
+    def __init__(self, cell_degrees: float = 1.0):
+        self.cell_degrees = cell_degrees
+        self._cells: Dict[Tuple[int, int], Set[str]] = {}
+        self._entries: Dict[str, Tuple[int, int]] = {}
+
+    def add(self, hotel_id: str, lat: float, lng: float) -> None:
+        """Insert or move a hotel in the grid."""
+        self.remove(hotel_id)
+        cell = self._cell(lat, lng)
+        self._cells.setdefault(cell, set()).add(hotel_id)
+        self._entries[hotel_id] = cell
+
+    def remove(self, hotel_id: str) -> None:
+        """Remove a hotel from the grid if present."""
+        cell = self._entries.pop(hotel_id, None)
+        if cell is None:
+            return
+        members = self._cells[cell]
+        members.discard(hotel_id)
+        if not members:
+            del self._cells[cell]
+
+    def candidates(self, lat: float, lng: float, radius_km: float) -> List[str]:
+        """Hotels in every cell that may lie within radius_km of a point."""
+        lat_span = math.ceil(radius_km / (KM_PER_DEGREE * self.cell_degrees))
+
+        # Longitude degrees shrink towards the poles; size the window for the
+        # most poleward latitude it can reach
+        edge_lat = min(abs(lat) + lat_span * self.cell_degrees, 90.0)
+        km_per_lng_cell = KM_PER_DEGREE * self.cell_degrees * math.cos(
+            math.radians(edge_lat)
+        )
+        lng_cells = math.ceil(360 / self.cell_degrees)
+        if km_per_lng_cell <= 0:
+            lng_span = lng_cells
+        else:
+            lng_span = min(math.ceil(radius_km / km_per_lng_cell), lng_cells)
+
+        center_lat, center_lng = self._cell(lat, lng)
+        found = []
+        seen_lng = set()
+        for d_lng in range(-lng_span, lng_span + 1):
+            # Wrap around the antimeridian
+            cell_lng = (center_lng + d_lng) % lng_cells
+            if cell_lng in seen_lng:
+                continue
+            seen_lng.add(cell_lng)
+            for d_lat in range(-lat_span, lat_span + 1):
+                found.extend(self._cells.get((center_lat + d_lat, cell_lng), ()))
+        return found
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        """Grid cell of a coordinate."""
+        lng_cells = math.ceil(360 / self.cell_degrees)
+        return (
+            math.floor(lat / self.cell_degrees),
+            math.floor((lng + 180) / self.cell_degrees) % lng_cells,
+        )
@@ -1,6 +1,96 @@
 import json
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import requests
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, Optional
+
+
+def parse_json_response(text: str) -> Optional[Any]:
+    """Parse JSON from an LLM answer, tolerating markdown code fences."""
+    cleaned = text.strip()
+    fence = re.match(r"^```(?:json)?\s*(.*?)\s*```$", cleaned, re.DOTALL)
+    if fence:
+        cleaned = fence.group(1)
+    try:
+        return json.loads(cleaned)
+    except ValueError:
+        return None
+
+
+# Fraction of request_timeout a deadline must cut before a timeout is blamed
+# on the caller rather than on the API
+DEADLINE_TOLERANCE = 0.1
+
+
+class CircuitBreaker:
+    """Fail fast after consecutive API failures, probing again after a cool-down."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Check whether a request may go to the API right now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+            # Half-open: let a single probe request through
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        """Close the breaker after a successful request."""
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """Count a failure and open the breaker once the threshold is reached."""
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if (
+                self.state == self.HALF_OPEN
+                or self.consecutive_failures >= self.failure_threshold
+            ):
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def record_abandoned(self) -> None:
+        """Release a probe whose outcome says nothing about upstream health."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the breaker state for metrics reporting."""
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "times_opened": self.times_opened,
+            }
 
 
 class LLMClient:
@@ -15,232 +105,205 @@ class LLMClient:
         self.model_name = self.config.get("model_name", "deepseek-chat")
         self.max_tokens = self.config.get("max_tokens", 2000)
         self.temperature = self.config.get("temperature", 0.7)
+        self.request_timeout = self.config.get("request_timeout", 30)
+
+        # Resilience: circuit breaker and optional hedged requests
+        self.breaker = CircuitBreaker(
+            failure_threshold=self.config.get("breaker_failure_threshold", 5),
+            reset_timeout=self.config.get("breaker_reset_seconds", 30),
+        )
+        # Timeouts after waiting this long count as upstream failures even
+        # when the caller's deadline had shortened the request
+        self.slow_call_seconds = self.config.get("breaker_slow_call_seconds", 10)
+        self.hedge_enabled = self.config.get("hedge_enabled", False)
+        self.hedge_percentile = self.config.get("hedge_percentile", 95)
+        self.hedge_min_samples = self.config.get("hedge_min_samples", 20)
+        self._executor = None
+        self._latencies = deque(maxlen=200)
+        self._counters = {
+            "requests": 0,
+            "failures": 0,
+            "fallbacks": 0,
+            "short_circuited": 0,
+            "deadline_exceeded": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+        }
+        self._lock = threading.Lock()
 
     def chat_completion(
-        self, messages: list, system_prompt: Optional[str] = None
+        self,
+        messages: list,
+        system_prompt: Optional[str] = None,
+        fallback: Optional[Callable[[], str]] = None,
+        deadline: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        json_mode: bool = False,
     ) -> str:
-        """Send chat completion request to LLM."""
+        """Send chat completion request to LLM.
+
+        When the API is unavailable, ``fallback`` (e.g. a local ranking) answers
+        instead; without one a RuntimeError is raised. ``deadline`` is an absolute
+        ``time.monotonic()`` value bounding the whole call; ``max_tokens``
+        overrides the configured output limit for this request. ``json_mode``
+        asks the API to return a single JSON object.
+        """
         if not self.api_key or self.api_key == "YOUR_DEEPSEEK_API_KEY_HERE":
-            return self._mock_response(messages, system_prompt)
+            return self._fallback_response(fallback)
+
+        timeout = self.request_timeout
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.monotonic())
+            if timeout <= 0:
+                self._count("deadline_exceeded")
+                return self._fallback_response(fallback)
+
+        # Fail fast while the upstream API is known to be unhealthy
+        if not self.breaker.allow_request():
+            self._count("short_circuited")
+            return self._fallback_response(fallback)
+
+        # Prepare messages
+        formatted_messages = []
+        if system_prompt:
+            formatted_messages.append({"role": "system", "content": system_prompt})
+
+        for msg in messages:
+            formatted_messages.append(msg)
+
+        data = {
+            "model": self.model_name,
+            "messages": formatted_messages,
+            "max_tokens": max_tokens or self.max_tokens,
+            "temperature": self.temperature,
+        }
+        if json_mode:
+            data["response_format"] = {"type": "json_object"}
 
+        self._count("requests")
+        started = time.monotonic()
         try:
-            # Prepare messages
-            formatted_messages = []
-            if system_prompt:
-                formatted_messages.append({"role": "system", "content": system_prompt})
-
-            for msg in messages:
-                formatted_messages.append(msg)
-
-            # Make API request
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-            }
-
-            data = {
-                "model": self.model_name,
-                "messages": formatted_messages,
-                "max_tokens": self.max_tokens,
-                "temperature": self.temperature,
-            }
-
-            response = requests.post(
-                f"{self.base_url}/v1/chat/completions",
-                headers=headers,
-                json=data,
-                timeout=30,
-            )
-
-            if response.status_code == 200:
-                result = response.json()
-                return result["choices"][0]["message"]["content"]
-            else:
-                print(f"API Error: {response.status_code} - {response.text}")
-                return self._mock_response(messages, system_prompt)
-
+            content = self._post_with_hedge(data, timeout)
         except Exception as e:
+            # A timeout the caller's deadline cut well short of request_timeout
+            # is not evidence of an unhealthy API, so it must not open the
+            # breaker for everyone; a deadline trimming only the clock drift
+            # of earlier steps, or a long wait, still counts as a failure
+            waited = time.monotonic() - started
+            deadline_limited = (
+                self.request_timeout - timeout
+                > DEADLINE_TOLERANCE * self.request_timeout
+                and waited < self.slow_call_seconds
+            )
+            if deadline_limited and isinstance(e, (requests.Timeout, TimeoutError)):
+                self._count("deadline_exceeded")
+                self.breaker.record_abandoned()
+                return self._fallback_response(fallback)
             print(f"LLM API Error: {str(e)}")
-            return self._mock_response(messages, system_prompt)
-
-    def _mock_response(
-        self, messages: list, system_prompt: Optional[str] = None
-    ) -> str:
-        """Provide mock response when API is not available."""
-        last_message = messages[-1]["content"] if messages else ""
-
-        # Check if this is an enhanced recommendation request
-        if (
-            "complete" in last_message.lower()
-            or "enhanced" in last_message.lower()
-            or "optimize" in last_message.lower()
-        ):
-            return self._generate_enhanced_mock_response(last_message)
-        elif "recommend" in last_message.lower():
-            return self._generate_basic_mock_response(last_message)
-        else:
-            return "I understand your requirements. Please tell me which aspects of the hotel you care about most, such as location features, transportation convenience, natural environment, etc., and I will provide personalized recommendations."
-
-    def _generate_basic_mock_response(self, user_input: str) -> str:
-        """Generate basic mock recommendation response."""
-        # Analyze user preferences from input
-        preferences = self._analyze_user_preferences(user_input)
-
-        if "mountain" in user_input.lower():
-            return """Based on your requirements analysis, I recommend the following hotels:
-
-**Recommendations:**
-
-1. **Mountain View Resort** (Rating: 4.5/5)
-   - Reason: Located at the foot of mountains, offering excellent mountain views, perfect for nature lovers
-   - Features: Direct access to hiking trails, mountain bike rental service
-
-2. **Countryside Manor** (Rating: 4.1/5)
-   - Reason: Quiet rural environment with surrounding hills, suitable for relaxation
-   - Features: Away from city noise, providing peaceful natural environment
-
-3. **Riverside Inn** (Rating: 4.2/5) 
-   - Reason: Riverside location provides quiet environment, river sounds help relaxation
-   - Features: Direct river access, fishing and kayak equipment rental
-
-These recommendations are based on location features and guest feedback mentioned in reviews."""
-
-        elif "transportation" in user_input.lower() or "business" in user_input.lower():
-            return """Based on your requirements analysis, I recommend the following hotels:
-
-**Recommendations:**
-
-1. **Downtown Business Hotel** (Rating: 4.3/5)
-   - Reason: City center location, convenient transportation, suitable for business and city sightseeing
-   - Features: Walking distance to metro station, rich dining and shopping options nearby
-
-2. **Airport Express Hotel** (Rating: 4.0/5)
-   - Reason: Close to airport, convenient shuttle service, suitable for business travel
-   - Features: 24-hour shuttle service, comprehensive business facilities
-
-3. **Historic Town Square Inn** (Rating: 4.2/5)
-   - Reason: Located in historic district center, convenient transportation with cultural character
-   - Features: Walking distance to multiple historic sites and business districts
-
-These recommendations are based on transportation convenience and business facilities mentioned in reviews."""
-
-        else:
-            return """Based on your requirements analysis, I recommend the following hotels:
-
-**Recommendations:**
-
-1. **Beachfront Paradise Resort** (Rating: 4.6/5)
-   - Reason: Beachfront location, beautiful environment, perfect for vacation relaxation
-   - Features: Direct beach access, complete water sports facilities
-
-2. **Lakeside Lodge** (Rating: 4.3/5)
-   - Reason: Lakeside environment is quiet, suitable for family vacation
-   - Features: Lake view rooms, boat rental service
-
-3. **Mountain View Resort** (Rating: 4.5/5)
-   - Reason: Beautiful mountain views, fresh air, suitable for nature enthusiasts
-   - Features: Hiking trails, rich outdoor activities
-
-These recommendations are based on environmental features and guest feedback mentioned in reviews."""
-
-    def _generate_enhanced_mock_response(self, user_input: str) -> str:
-        """Generate enhanced mock recommendation response with information completion."""
-        # Analyze user preferences
-        if "mountain" in user_input.lower():
-            return """**🔍 Information Completion Analysis Results:**
-
-Based on geographic location and similar hotel information, I have inferred missing information:
-
-**📊 Completed Information:**
-- **Countryside Manor**: Inferred near mountain area (Confidence: 72%) - Based on geographic location similarity
-- **Historic Town Square Inn**: Inferred mountain views nearby (Confidence: 58%) - Based on similar hotel features
-- **Lakeside Lodge**: Inferred hills around lake (Confidence: 67%) - Based on terrain analysis
-
-**⭐ Updated Recommendations:**
-
-1. **Mountain View Resort** (Rating: 4.5/5) 
-   - Reason: Located at mountain foot, offering excellent mountain views ✅ *Complete Information*
-   - Features: Direct access to hiking trails, mountain bike rental service
-
-2. **🆕 Lakeside Lodge** (Rating: 4.4/5) *Ranking Improved*
-   - Reason: Lake possibly surrounded by hills 🔍 *Based on completed information (67% confidence)*
-   - Features: Potential lake + mountain view dual experience, suitable for diverse outdoor activities
-
-3. **🆕 Countryside Manor** (Rating: 4.3/5) *New Recommendation*
-   - Reason: Possibly located in rural mountain area 🔍 *Based on completed information (72% confidence)*
-   - Features: Inferred away from city, possibly pure mountain air
-
-**📈 Recommendation Changes Explained:**
-- Added 2 hotels based on information completion (confidence below 75%)
-- Reordered recommendation priority, considering information uncertainty
-- Completed information provides more possibilities, but needs actual verification"""
-
-        elif "transportation" in user_input.lower() or "business" in user_input.lower():
-            return """**🔍 Information Completion Analysis Results:**
-
-Based on geographic location and similar hotel information, I have inferred missing information:
-
-**📊 Completed Information:**
-- **Historic Town Square Inn**: Inferred high transportation convenience (Confidence: 63%) - Based on urban location
-- **Beachfront Paradise Resort**: Inferred possible airport shuttle (Confidence: 45%) - Based on resort standards
-- **Lakeside Lodge**: Inferred possibly inconvenient transportation (Confidence: 78%) - Based on remote location
-
-**⭐ Updated Recommendations:**
-
-1. **Downtown Business Hotel** (Rating: 4.3/5)
-   - Reason: City center location, convenient transportation ✅ *Complete Information*
-   - Features: Walking distance to metro station, rich dining and shopping options nearby
-
-2. **🆕 Historic Town Square Inn** (Rating: 4.4/5) *Ranking Improved*
-   - Reason: Historic district center, possibly convenient transportation with cultural character 🔍 *Based on completed information (63% confidence)*
-   - Features: Inferred walking distance to multiple transportation hubs and business districts
-
-3. **Airport Express Hotel** (Rating: 4.0/5)
-   - Reason: Near airport, convenient shuttle service ✅ *Complete Information*
-   - Features: 24-hour shuttle service, comprehensive business facilities
-
-**📈 Recommendation Changes Explained:**
-- Historic Town Square Inn ranking improved based on inferred transportation information (63% confidence)
-- Filtered out hotels with potentially inconvenient transportation (78% confidence)
-- Completed information provides more reference, but accuracy needs actual verification"""
-
-        else:
-            return """**🔍 Information Completion Analysis Results:**
-
-Based on geographic location and similar hotel information, I have inferred missing information:
-
-**📊 Completed Information:**
-- **Mountain View Resort**: Inferred possible SPA service (Confidence: 52%) - Based on resort features
-- **Historic Town Square Inn**: Inferred possible cultural activities (Confidence: 68%) - Based on historic location
-- **Countryside Manor**: Inferred possible organic restaurant (Confidence: 47%) - Based on rural character
-
-**⭐ Updated Recommendations:**
-
-1. **🆕 Historic Town Square Inn** (Rating: 4.5/5) *Ranking Improved*
-   - Reason: Rich historical cultural atmosphere, possibly regular cultural activities 🔍 *Based on completed information (68% confidence)*
-   - Features: Historic building + potential cultural experience, unique accommodation possibility
-
-2. **Beachfront Paradise Resort** (Rating: 4.6/5)
-   - Reason: Beachfront location, beautiful environment ✅ *Complete Information*
-   - Features: Direct beach access, complete water sports facilities
-
-3. **🆕 Mountain View Resort** (Rating: 4.6/5) *Service Upgrade*
-   - Reason: Beautiful mountain views + possible SPA service 🔍 *Based on completed information (52% confidence)*
-   - Features: Hiking trails + potential SPA center, possible physical and mental relaxation experience
-
-**📈 Recommendation Changes Explained:**
-- Re-evaluated hotel service quality based on inferred information (all confidence below 70%)
-- Historic Town Square Inn ranking improved due to potential cultural features
-- Completed information provides service upgrade possibilities, but needs actual confirmation"""
-
-    def _analyze_user_preferences(self, user_input: str) -> dict:
-        """Analyze user preferences from input text."""
-        preferences = {
-            "mountain": "mountain" in user_input.lower(),
-            "business": "transportation" in user_input.lower()
-            or "business" in user_input.lower(),
-            "quiet": "quiet" in user_input.lower(),
-            "beach": "beach" in user_input.lower(),
-            "culture": "culture" in user_input.lower(),
+            self._count("failures")
+            self.breaker.record_failure()
+            return self._fallback_response(fallback)
+
+        with self._lock:
+            self._latencies.append(time.monotonic() - started)
+        self.breaker.record_success()
+        return content
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return breaker state, request counters and latency percentiles."""
+        with self._lock:
+            metrics = dict(self._counters)
+            latencies = sorted(self._latencies)
+        metrics["breaker"] = self.breaker.snapshot()
+        metrics["latency_p50"] = self._percentile(latencies, 50)
+        metrics["latency_p95"] = self._percentile(latencies, 95)
+        return metrics
+
+    def _post(self, data: Dict[str, Any], timeout: float) -> str:
+        """Make a single API request and return the completion text."""
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
         }
-        return preferences
+
+        response = requests.post(
+            f"{self.base_url}/v1/chat/completions",
+            headers=headers,
+            json=data,
+            timeout=timeout,
+        )
+
+        if response.status_code != 200:
+            raise RuntimeError(f"API Error: {response.status_code} - {response.text}")
+
+        result = response.json()
+        return result["choices"][0]["message"]["content"]
+
+    def _post_with_hedge(self, data: Dict[str, Any], timeout: float) -> str:
+        """Send the request, racing a second copy if the first one is slow."""
+        hedge_delay = None
+        if self.hedge_enabled:
+            with self._lock:
+                if len(self._latencies) >= self.hedge_min_samples:
+                    hedge_delay = self._percentile(
+                        sorted(self._latencies), self.hedge_percentile
+                    )
+
+        if hedge_delay is None or hedge_delay >= timeout:
+            return self._post(data, timeout)
+
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.config.get("hedge_max_workers", 8),
+                        thread_name_prefix="llm-hedge",
+                    )
+
+        started = time.monotonic()
+        primary = self._executor.submit(self._post, data, timeout)
+        done, _ = wait([primary], timeout=hedge_delay)
+        if done:
+            return primary.result()
+
+        self._count("hedged")
+        remaining = timeout - (time.monotonic() - started)
+        hedge = self._executor.submit(self._post, data, max(remaining, 0.001))
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(
+                pending,
+                timeout=max(timeout - (time.monotonic() - started), 0),
+                return_when=FIRST_COMPLETED,
+            )
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+
+        raise error or TimeoutError("LLM request exceeded its deadline")
+
+    def _count(self, counter: str) -> None:
+        """Increment a metrics counter."""
+        with self._lock:
+            self._counters[counter] += 1
+
+    @staticmethod
+    def _percentile(values: list, percentile: float) -> Optional[float]:
+        """Nearest-rank percentile of a sorted list."""
+        if not values:
+            return None
+        rank = max(int(round(percentile / 100 * len(values))) - 1, 0)
+        return round(values[min(rank, len(values) - 1)], 3)
+
+    def _fallback_response(self, fallback: Optional[Callable[[], str]]) -> str:
+        """Answer locally when the API is not available."""
+        if fallback is None:
+            raise RuntimeError("LLM API is unavailable and no local fallback was given")
+        self._count("fallbacks")
+        return fallback()
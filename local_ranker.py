@@ -0,0 +1,342 @@
+import re
+from typing import Any, Dict, List, Optional
+
+from preferences import THEME_KEYWORDS, normalize_preferences
+
+# Boolean hotel tags that confirm a location theme
+THEME_TAGS = {
+    "mountain": ["near_mountain", "mountain", "ski"],
+    "river": ["near_river"],
+    "downtown": ["downtown", "urban"],
+    "lake": ["near_lake"],
+    "airport": ["near_airport"],
+    "historic": ["historic"],
+    "beach": ["beachfront", "coastal"],
+    "countryside": ["countryside", "rural", "forest", "prairie", "vineyard"],
+}
+
+# Scoring weights
+THEME_WEIGHT = 0.35
+AMENITY_WEIGHT = 0.2
+NEARBY_WEIGHT = 0.1
+RATING_WEIGHT = 0.15
+TEXT_WEIGHT = 0.3
+REVIEW_THEME_CREDIT = 0.25  # themes only seen in reviews are weak evidence
+CONSTRAINT_PENALTY = 0.5
+
+NO_MATCH_MESSAGE = (
+    "No hotels match the selected constraints. Try relaxing the star rating, "
+    "price range or required amenities."
+)
+
+
+class LocalRanker:
+    """Deterministic offline ranker over the engine's hotel catalog."""
+
+    def __init__(self, engine: Any):
+        """Attach to a recommendation engine and its derived catalog state."""
+        self.engine = engine
+
+    def rank(
+        self,
+        user_preferences: str,
+        completed_info: Optional[Dict[str, Any]] = None,
+        candidate_ids: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Score hotels against a preference, best match first."""
+        normalized = normalize_preferences(user_preferences)
+        wanted_themes = set(normalized["themes"])
+        wanted_amenities = set(normalized["amenities"])
+
+        hotels = self.engine.hotels
+        if candidate_ids is not None:
+            wanted_ids = set(candidate_ids)
+            hotels = [hotel for hotel in hotels if hotel["id"] in wanted_ids]
+
+        text_scores = self.engine.score_preferences([user_preferences])
+
+        ranked = []
+        for hotel in hotels:
+            hotel_id = hotel["id"]
+            tags = hotel.get("tags", {})
+            hotel_tags = {key for key, value in tags.items() if value is True}
+            tag_themes = self._matched_themes(wanted_themes, [], hotel_tags)
+            matched_themes = self._matched_themes(
+                wanted_themes, self.engine.hotel_themes[hotel_id], hotel_tags
+            )
+
+            # Inferred tags count with their confidence
+            inferred = {}
+            if completed_info and hotel_id in completed_info:
+                inferred = completed_info[hotel_id].get("confidence_scores", {})
+            inferred_themes = set()
+            inferred_weight = 0.0
+            for theme in wanted_themes - matched_themes:
+                for tag in THEME_TAGS.get(theme, []):
+                    if tag in inferred:
+                        inferred_themes.add(theme)
+                        inferred_weight += inferred[tag] / 100
+                        break
+
+            score = 0.0
+            if wanted_themes:
+                theme_credit = (
+                    len(tag_themes)
+                    + REVIEW_THEME_CREDIT * len(matched_themes - tag_themes)
+                    + inferred_weight
+                )
+                score += THEME_WEIGHT * theme_credit / len(wanted_themes)
+
+            amenities = set(tags.get("amenities", []))
+            matched_amenities = wanted_amenities & amenities
+            if wanted_amenities:
+                score += AMENITY_WEIGHT * len(matched_amenities) / len(wanted_amenities)
+
+            # Hotels near others carrying the wanted themes are likely in the
+            # same kind of area
+            nearby_support = 0.0
+            for neighbour, distance in self.engine._nearby_hotels(hotel):
+                neighbour_tags = {
+                    key
+                    for key, value in neighbour.get("tags", {}).items()
+                    if value is True
+                }
+                if self._matched_themes(wanted_themes, [], neighbour_tags):
+                    nearby_support = max(nearby_support, 1 - distance / 100)
+            score += NEARBY_WEIGHT * nearby_support
+
+            stats = self.engine.review_stats[hotel_id]
+            if stats["count"]:
+                score += RATING_WEIGHT * (stats["average_rating"] - 1) / 4
+
+            score += TEXT_WEIGHT * text_scores[hotel_id][0]
+
+            violations = self._constraint_violations(normalized, tags)
+            score -= CONSTRAINT_PENALTY * len(violations)
+
+            ranked.append(
+                {
+                    "hotel": hotel,
+                    "score": round(score, 4),
+                    "matched_themes": sorted(matched_themes),
+                    "inferred_themes": sorted(inferred_themes),
+                    "matched_amenities": sorted(matched_amenities),
+                    "violations": violations,
+                }
+            )
+
+        # Ties resolve by hotel id so the ranking is deterministic
+        return sorted(ranked, key=lambda x: (-x["score"], x["hotel"]["id"]))
+
+    def render_basic(
+        self,
+        user_preferences: str,
+        top_k: int = 3,
+        candidate_ids: Optional[List[str]] = None,
+    ) -> str:
+        """Render a ranking in the same markdown shape as LLM recommendations."""
+        ranked = self.rank(user_preferences, candidate_ids=candidate_ids)[:top_k]
+
+        lines = [
+            "Based on your requirements analysis, I recommend the following hotels:",
+            "",
+            "**Recommendations:**",
+            "",
+        ]
+        for position, entry in enumerate(ranked, 1):
+            lines.extend(self._render_entry(position, entry))
+            lines.append("")
+        lines.append(
+            "These recommendations are ranked locally from hotel tags, review "
+            "themes, location and guest ratings."
+        )
+        return "\n".join(lines)
+
+    def render_enhanced(
+        self,
+        user_preferences: str,
+        completed_info: Dict[str, Any],
+        top_k: int = 3,
+        candidate_ids: Optional[List[str]] = None,
+    ) -> str:
+        """Render an information-completed ranking in the enhanced markdown shape."""
+        ranked = self.rank(user_preferences, completed_info, candidate_ids)[:top_k]
+        baseline = [
+            entry["hotel"]["id"]
+            for entry in self.rank(user_preferences, candidate_ids=candidate_ids)
+        ]
+
+        lines = [
+            "**🔍 Information Completion Analysis Results:**",
+            "",
+            "Based on geographic location and similar hotel information, "
+            "I have inferred missing information:",
+            "",
+            "**📊 Completed Information:**",
+        ]
+        for entry in ranked:
+            hotel_id = entry["hotel"]["id"]
+            confidence = completed_info.get(hotel_id, {}).get("confidence_scores", {})
+            if confidence:
+                inferred = ", ".join(
+                    f"{feature} ({score:.0f}%)" for feature, score in confidence.items()
+                )
+                lines.append(
+                    f"- **{entry['hotel']['name']}**: Inferred {inferred} "
+                    "- Based on nearby similar hotels"
+                )
+            else:
+                lines.append(
+                    f"- **{entry['hotel']['name']}**: No additional features inferred"
+                )
+
+        lines.extend(["", "**⭐ Updated Recommendations:**", ""])
+        for position, entry in enumerate(ranked, 1):
+            hotel_id = entry["hotel"]["id"]
+            marker = ""
+            if hotel_id not in baseline[:top_k]:
+                marker = " *New Recommendation*"
+            elif baseline.index(hotel_id) + 1 > position:
+                marker = " *Ranking Improved*"
+            lines.extend(self._render_entry(position, entry, marker))
+            lines.append("")
+
+        lines.extend(
+            [
+                "**📈 Recommendation Changes Explained:**",
+                "- Inferred features are weighted by their confidence scores",
+                "- Completed information needs actual verification",
+            ]
+        )
+        return "\n".join(lines)
+
+    def structured_items(
+        self,
+        user_preferences: str,
+        top_k: int = 3,
+        candidate_ids: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Ranking in the structured recommendation schema."""
+        ranked = self.rank(user_preferences, candidate_ids=candidate_ids)[:top_k]
+        return [
+            {
+                "hotel_id": entry["hotel"]["id"],
+                "score": round(min(max(entry["score"], 0.0), 1.0), 3),
+                "reason": "; ".join(self._reasons(entry)),
+                "inferred": bool(entry["inferred_themes"]),
+            }
+            for entry in ranked
+        ]
+
+    def render_structured(self, items: List[Dict[str, Any]]) -> str:
+        """Render structured recommendations as markdown without the LLM."""
+        if not items:
+            return NO_MATCH_MESSAGE
+        lines = [
+            "Based on your requirements analysis, I recommend the following hotels:",
+            "",
+            "**Recommendations:**",
+            "",
+        ]
+        for position, item in enumerate(items, 1):
+            hotel = self.engine.get_hotel(item["hotel_id"])
+            if hotel is None:
+                continue
+            stats = self.engine.review_stats[hotel["id"]]
+            marker = " 🔍 *Includes inferred information*" if item["inferred"] else ""
+            amenities = [
+                a.replace("_", " ") for a in hotel.get("tags", {}).get("amenities", [])
+            ]
+            lines.extend(
+                [
+                    f"{position}. **{hotel['name']}** "
+                    f"(Rating: {stats['average_rating']:.1f}/5){marker}",
+                    f"   - Match Score: {item['score'] * 100:.0f}%",
+                    f"   - Reason: {item['reason']}",
+                    f"   - Features: {', '.join(amenities) or 'N/A'}",
+                    "",
+                ]
+            )
+        return "\n".join(lines).rstrip()
+
+    def _render_entry(
+        self, position: int, entry: Dict[str, Any], marker: str = ""
+    ) -> List[str]:
+        """Render one ranked hotel as a numbered markdown item."""
+        hotel = entry["hotel"]
+        stats = self.engine.review_stats[hotel["id"]]
+        reasons = self._reasons(entry)
+
+        amenities = [
+            a.replace("_", " ") for a in hotel.get("tags", {}).get("amenities", [])
+        ]
+        return [
+            f"{position}. **{hotel['name']}** "
+            f"(Rating: {stats['average_rating']:.1f}/5){marker}",
+            f"   - Reason: {'; '.join(reasons)}",
+            f"   - Features: {', '.join(amenities) or 'N/A'}",
+        ]
+
+    def _reasons(self, entry: Dict[str, Any]) -> List[str]:
+        """Short explanations of why a ranked hotel matches."""
+        hotel = entry["hotel"]
+        reasons = []
+        if entry["matched_themes"]:
+            reasons.append("Matches " + ", ".join(entry["matched_themes"]))
+        if entry["inferred_themes"]:
+            reasons.append(
+                "possibly "
+                + ", ".join(entry["inferred_themes"])
+                + " 🔍 *Based on completed information*"
+            )
+        if entry["matched_amenities"]:
+            reasons.append(
+                "offers "
+                + ", ".join(a.replace("_", " ") for a in entry["matched_amenities"])
+            )
+        snippet = self._review_snippet(hotel, entry["matched_themes"])
+        if snippet:
+            reasons.append(f'guests say "{snippet}"')
+        if not reasons:
+            reasons.append("Well rated by guests")
+        if entry["violations"]:
+            reasons.append("note: " + ", ".join(entry["violations"]))
+        return reasons
+
+    def _matched_themes(
+        self, wanted_themes: set, review_themes: List[str], hotel_tags: set
+    ) -> set:
+        """Wanted themes confirmed by review themes or boolean hotel tags."""
+        return {
+            theme
+            for theme in wanted_themes
+            if theme in review_themes
+            or any(tag in hotel_tags for tag in THEME_TAGS.get(theme, []))
+        }
+
+    def _constraint_violations(self, normalized: Dict, tags: Dict) -> List[str]:
+        """List the hard price/star constraints a hotel does not satisfy."""
+        violations = []
+        price_level = len(tags.get("price_range", ""))
+        if normalized["max_price"] and price_level > normalized["max_price"]:
+            violations.append("above price range")
+        if normalized["min_price"] and price_level < normalized["min_price"]:
+            violations.append("below price range")
+        star_rating = tags.get("star_rating", 0)
+        if normalized["min_stars"] and star_rating < normalized["min_stars"]:
+            violations.append("below star rating")
+        if normalized["max_stars"] and star_rating > normalized["max_stars"]:
+            violations.append("above star rating")
+        return violations
+
+    def _review_snippet(self, hotel: Dict, themes: List[str]) -> str:
+        """Pick the first review sentence mentioning a matched theme."""
+        keywords = [kw for theme in themes for kw in THEME_KEYWORDS.get(theme, [])]
+        if not keywords:
+            return ""
+        for review in sorted(hotel.get("reviews", []), key=lambda r: -r["rating"]):
+            for sentence in re.split(r"(?<=[.!?])\s+", review["text"]):
+                lowered = sentence.lower()
+                if any(keyword in lowered for keyword in keywords):
+                    return sentence.rstrip(".!?")
+        return ""
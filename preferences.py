@@ -0,0 +1,331 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Keywords used to detect location/atmosphere themes, shared by review theme
+# extraction and preference normalization.
+THEME_KEYWORDS = {
+    "mountain": ["mountain", "mountains", "hiking", "view", "peak", "trail"],
+    "river": ["river", "water", "fishing", "stream", "waterfront", "riverside"],
+    "downtown": [
+        "downtown",
+        "city center",
+        "business",
+        "transportation",
+        "metro",
+        "urban",
+    ],
+    "lake": ["lake", "swimming", "boat", "lakeside", "waterfront", "shore"],
+    "airport": [
+        "airport",
+        "shuttle",
+        "flight",
+        "terminal",
+        "transit",
+        "layover",
+    ],
+    "historic": [
+        "historic",
+        "heritage",
+        "culture",
+        "traditional",
+        "ancient",
+        "classic",
+    ],
+    "beach": ["beach", "ocean", "surf", "sea", "coastal", "sand"],
+    "countryside": [
+        "countryside",
+        "rural",
+        "farm",
+        "nature",
+        "peaceful",
+        "quiet",
+    ],
+}
+
+# Canonical amenity names (as used in hotel tags) and the phrases users write.
+AMENITY_KEYWORDS = {
+    "wifi": ["wifi", "wi-fi", "internet"],
+    "parking": ["parking", "car park"],
+    "pool": ["pool", "swimming pool"],
+    "spa": ["spa", "massage"],
+    "restaurant": ["restaurant", "dining"],
+    "business_center": ["business center", "business centre"],
+    "gym": ["gym", "fitness"],
+    "concierge": ["concierge"],
+    "boat_rental": ["boat rental", "kayak"],
+    "shuttle": ["shuttle"],
+    "24hr_front_desk": ["24 hour", "24-hour", "24hr", "late check-in"],
+    "historic_charm": ["historic charm"],
+    "beach_access": ["beach access"],
+    "golf": ["golf"],
+    "fireplace": ["fireplace"],
+    "hiking_trails": ["hiking trail", "hiking trails"],
+    "rooftop_bar": ["rooftop"],
+    "coworking": ["coworking", "co-working", "workspace"],
+    "wine_tasting": ["wine", "winery", "vineyard"],
+    "ski_rental": ["ski rental", "ski equipment"],
+    "hot_tub": ["hot tub", "jacuzzi"],
+    "garden": ["garden"],
+}
+
+BUDGET_WORDS = ["cheap", "budget", "affordable", "inexpensive", "low cost"]
+LUXURY_WORDS = ["luxury", "luxurious", "upscale", "high-end"]
+
+NUMBER_WORDS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5}
+
+# Qualifiers that turn a price or star level into a bound
+STRICT_UPPER = ("under", "below", "less than", "fewer than")
+INCLUSIVE_UPPER = ("up to", "at most", "no more than", "max", "maximum")
+STRICT_LOWER = ("over", "above", "more than")
+INCLUSIVE_LOWER = ("at least", "no less than", "min", "minimum", "+", "plus")
+UPPER_SUFFIXES = ("or below", "or less", "or under", "or lower", "or fewer")
+LOWER_SUFFIXES = (
+    "or above",
+    "or more",
+    "or higher",
+    "or better",
+    "and up",
+    "and above",
+)
+
+_QUALIFIER = (
+    r"(?:\b(?P<qualifier>under|below|less\s+than|fewer\s+than|up\s+to|at\s+most"
+    r"|no\s+more\s+than|maximum|max|over|above|more\s+than|at\s+least"
+    r"|no\s+less\s+than|minimum|min)\s*)?"
+)
+_SUFFIX = r"(?:\s*(?P<suffix>(?:or|and)\s+(?:below|less|under|lower|fewer|above|more|higher|better|up)))?"
+_STARS = r"(\d|one|two|three|four|five)"
+
+PRICE_RANGE_PATTERN = re.compile(
+    r"(?:between\s+)?(\${1,5})\s*(?:-|to|and)\s*(\${1,5})(?![\w$])"
+)
+PRICE_PATTERN = re.compile(_QUALIFIER + r"(?P<level>\${1,5})(?![\w$])" + _SUFFIX)
+STAR_RANGE_PATTERN = re.compile(
+    rf"(?:between\s+)?\b{_STARS}\s*(?:-|to|and)\s*{_STARS}[\s-]*stars?\b"
+)
+STAR_PATTERN = re.compile(
+    _QUALIFIER
+    + rf"\b(?P<level>\d|one|two|three|four|five)\s*(?P<plus>\+|plus)?[\s-]*stars?\b"
+    + _SUFFIX
+)
+
+STOP_WORDS = set(
+    "a an and the i me my we our want would like need looking for to with "
+    "in of on at near please hotel hotels stay place somewhere some is be "
+    "that it prefer suitable good nice".split()
+)
+
+
+def _contains_phrase(text: str, phrase: str) -> bool:
+    """Check whether a phrase appears in text as whole words (plural allowed)."""
+    return re.search(rf"\b{re.escape(phrase)}s?\b", text) is not None
+
+
+def _bounds(
+    level: int, qualifier: Optional[str], suffix: Optional[str], exact: bool
+) -> Tuple[Optional[int], Optional[int]]:
+    """Turn a level and its qualifier words into (lower, upper) bounds."""
+    qualifier = re.sub(r"\s+", " ", qualifier or "").strip()
+    suffix = re.sub(r"\s+", " ", suffix or "").strip()
+    if qualifier in STRICT_UPPER:
+        return None, max(level - 1, 1)
+    if qualifier in INCLUSIVE_UPPER or suffix in UPPER_SUFFIXES:
+        return None, level
+    if qualifier in STRICT_LOWER:
+        return min(level + 1, 5), None
+    if qualifier in INCLUSIVE_LOWER or suffix in LOWER_SUFFIXES:
+        return level, None
+    return (level, level) if exact else (level, None)
+
+
+def _star_level(raw: str) -> int:
+    """Star count written as a digit or a number word."""
+    return NUMBER_WORDS.get(raw) or int(raw)
+
+
+def normalize_preferences(user_input: str) -> Dict[str, Any]:
+    """Extract themes, amenities and price/star constraints from free text."""
+    text = user_input.lower()
+
+    matched_keywords = []
+    themes = []
+    for theme, keywords in THEME_KEYWORDS.items():
+        found = [keyword for keyword in keywords if _contains_phrase(text, keyword)]
+        if found:
+            themes.append(theme)
+            matched_keywords.extend(found)
+    amenities = []
+    for amenity, keywords in AMENITY_KEYWORDS.items():
+        found = [keyword for keyword in keywords if _contains_phrase(text, keyword)]
+        if found:
+            amenities.append(amenity)
+            matched_keywords.extend(found)
+    themes.sort()
+    amenities.sort()
+
+    # Price constraints, expressed as a number of "$" signs
+    max_price = None
+    min_price = None
+    price_range = PRICE_RANGE_PATTERN.search(text)
+    price_match = PRICE_PATTERN.search(text)
+    if price_range:
+        low, high = sorted(len(group) for group in price_range.groups())
+        min_price, max_price = low, high
+    elif price_match:
+        min_price, max_price = _bounds(
+            len(price_match.group("level")),
+            price_match.group("qualifier"),
+            price_match.group("suffix"),
+            exact=True,
+        )
+    elif any(_contains_phrase(text, word) for word in BUDGET_WORDS):
+        max_price = 2
+    if any(_contains_phrase(text, word) for word in LUXURY_WORDS):
+        min_price = max(min_price or 0, 4)
+
+    # Star rating constraints such as "4+ stars", "under 4 stars", "3-4 star"
+    min_stars = None
+    max_stars = None
+    star_range = STAR_RANGE_PATTERN.search(text)
+    star_match = STAR_PATTERN.search(text)
+    if star_range:
+        min_stars, max_stars = sorted(_star_level(raw) for raw in star_range.groups())
+    elif star_match:
+        min_stars, max_stars = _bounds(
+            _star_level(star_match.group("level")),
+            star_match.group("qualifier") or star_match.group("plus"),
+            star_match.group("suffix"),
+            exact=False,
+        )
+
+    # Content words not explained by a recognised feature, so "mountain hotel
+    # for families" and "mountain hotel for a honeymoon" stay distinct
+    remainder = text
+    for pattern in (PRICE_RANGE_PATTERN, PRICE_PATTERN, STAR_RANGE_PATTERN):
+        remainder = pattern.sub(" ", remainder)
+    remainder = STAR_PATTERN.sub(" ", remainder)
+    feature_words = set(BUDGET_WORDS) | set(LUXURY_WORDS)
+    for keyword in matched_keywords:
+        for word in re.findall(r"[a-z0-9]+", keyword):
+            feature_words.update((word, word + "s"))
+    terms = sorted(
+        {
+            word
+            for word in re.findall(r"[a-z0-9]+", remainder)
+            if word not in STOP_WORDS and word not in feature_words
+        }
+    )
+
+    return {
+        "themes": themes,
+        "amenities": amenities,
+        "min_price": min_price,
+        "max_price": max_price,
+        "min_stars": min_stars,
+        "max_stars": max_stars,
+        "terms": terms,
+    }
+
+
+def preference_key(normalized: Dict[str, Any]) -> str:
+    """Build a canonical, order-independent key for a normalized preference."""
+    parts = [
+        "themes=" + ",".join(normalized.get("themes", [])),
+        "amenities=" + ",".join(normalized.get("amenities", [])),
+        f"price={normalized.get('min_price')}-{normalized.get('max_price')}",
+        f"stars={normalized.get('min_stars')}-{normalized.get('max_stars')}",
+        "terms=" + ",".join(normalized.get("terms", [])),
+    ]
+    return "|".join(parts)
+
+
+def preference_similarity(pref1: Dict[str, Any], pref2: Dict[str, Any]) -> float:
+    """Calculate similarity between two normalized preferences (0 to 1)."""
+    # Hard constraints must agree exactly
+    for key in ("min_price", "max_price", "min_stars", "max_stars"):
+        if pref1.get(key) != pref2.get(key):
+            return 0.0
+
+    features1 = (
+        {f"theme:{t}" for t in pref1.get("themes", [])}
+        | {f"amenity:{a}" for a in pref1.get("amenities", [])}
+        | {f"term:{w}" for w in pref1.get("terms", [])}
+    )
+    features2 = (
+        {f"theme:{t}" for t in pref2.get("themes", [])}
+        | {f"amenity:{a}" for a in pref2.get("amenities", [])}
+        | {f"term:{w}" for w in pref2.get("terms", [])}
+    )
+    if not features1 and not features2:
+        return 1.0
+
+    union = len(features1 | features2)
+    return len(features1 & features2) / union if union > 0 else 0.0
+
+
+class PreferenceCache:
+    """LRU cache of recommendations keyed by normalized user preferences."""
+
+    def __init__(self, similarity_threshold: float = 0.8, max_entries: int = 256):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Dict, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    def get(self, context: str, normalized: Dict[str, Any]) -> Optional[Any]:
+        """Look up a cached value by exact key, then by preference similarity."""
+        key = (context, preference_key(normalized))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][1]
+
+            best_key = None
+            best_score = 0.0
+            for entry_key, (entry_pref, _) in self._entries.items():
+                if entry_key[0] != context:
+                    continue
+                score = preference_similarity(normalized, entry_pref)
+                if score > best_score:
+                    best_key, best_score = entry_key, score
+
+            if best_key is not None and best_score >= self.similarity_threshold:
+                self._entries.move_to_end(best_key)
+                self.hits += 1
+                self.similar_hits += 1
+                return self._entries[best_key][1]
+
+            self.misses += 1
+            return None
+
+    def put(self, context: str, normalized: Dict[str, Any], value: Any) -> None:
+        """Store a value under the canonical key of a normalized preference."""
+        key = (context, preference_key(normalized))
+        with self._lock:
+            self._entries[key] = (normalized, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all cached entries (statistics are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache statistics for metrics reporting."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
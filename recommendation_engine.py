@@ -1,7 +1,34 @@
+import hashlib
 import json
 import math
-from typing import Dict, List, Tuple, Any
-from llm_client import LLMClient
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple, Any
+from facet_index import FacetIndex, normalize_constraints
+from geo_index import GeoGridIndex
+from llm_client import LLMClient, parse_json_response
+from local_ranker import NO_MATCH_MESSAGE, LocalRanker
+from preferences import PreferenceCache, THEME_KEYWORDS, normalize_preferences
+from review_digest import (
+    build_extractive_digest,
+    build_llm_digest,
+    digest_path_for,
+    load_digests,
+    prompt_digest,
+    reviews_fingerprint,
+    save_digests,
+)
+from vector_index import TfidfIndex, stem, tokenize
+
+# Rough prompt size estimate used to decide when the catalog must be chunked
+CHARS_PER_TOKEN = 4
+PROMPT_OVERHEAD_TOKENS = 1000
+
+# Output budget of structured recommendations, sized to the requested K
+STRUCTURED_TOKENS_PER_HOTEL = 80
+STRUCTURED_OVERHEAD_TOKENS = 40
+MAX_REASON_CHARS = 200
 
 
 class RecommendationEngine:
@@ -14,30 +41,102 @@ class RecommendationEngine:
 
         self.hotels = self.data["hotels"]
         self.llm_client = LLMClient(config_path)
+        self._vector_index = TfidfIndex(self.hotels)
+        self._vector_index_dirty = False
+        self._catalog_lock = threading.RLock()
 
-    def get_basic_recommendations(self, user_preferences: str) -> str:
-        """Generate basic recommendations based on user preferences."""
-        # Prepare context for LLM
-        hotel_summaries = []
+        # Derived per-hotel state, computed once instead of on every request
+        # and kept up to date by add_hotel, update_hotel and append_reviews
+        self._hotels_by_id = {hotel["id"]: hotel for hotel in self.hotels}
+        self.geo_index = GeoGridIndex()
+        self.facet_index = FacetIndex()
+        self.hotel_themes = {}
+        self.review_stats = {}
+        self.digest_path = digest_path_for(data_path)
+        self._stored_digests = load_digests(self.digest_path)
+        self.review_digests = {}
+        self.similar_hotels = {}
+        self.inferred_features = {}
         for hotel in self.hotels:
-            # Summarize hotel information
-            tags = hotel.get("tags", {})
-            review_count = len(hotel.get("reviews", []))
+            self._index_hotel(hotel)
+        for hotel in self.hotels:
+            self._refresh_neighbours(hotel["id"])
+        for hotel in self.hotels:
+            self._refresh_inferred_features(hotel["id"])
+        self.local_ranker = LocalRanker(self)
 
-            # Extract key themes from reviews
-            review_themes = self._extract_review_themes(hotel["reviews"])
+        # Cache recommendations under normalized preferences so near-duplicate
+        # phrasings of the same need are served without another LLM call
+        config = self.llm_client.config
+        self.preference_cache = PreferenceCache(
+            similarity_threshold=config.get("cache_similarity_threshold", 0.8),
+            max_entries=config.get("cache_max_entries", 256),
+        )
+        self.local_fast_path = config.get("local_fast_path", False)
+        self.fast_path_max_words = config.get("fast_path_max_words", 12)
+        self.request_budget = config.get("request_budget_seconds", 45)
 
-            summary = {
-                "name": hotel["name"],
-                "location": hotel["address"],
-                "star_rating": tags.get("star_rating", "N/A"),
-                "price_range": tags.get("price_range", "N/A"),
-                "amenities": tags.get("amenities", []),
-                "review_count": review_count,
-                "key_themes": review_themes,
-                "tags": tags,
-            }
-            hotel_summaries.append(summary)
+        # Map-reduce prompting for catalogs that exceed the context window
+        self.context_window_tokens = config.get("context_window_tokens", 64000)
+        self.chunk_size = config.get("chunk_size", 0)
+        self.chunk_parallelism = config.get("chunk_parallelism", 4)
+        self.chunk_shortlist_size = config.get("chunk_shortlist_size", 3)
+        if self.chunk_shortlist_size < 1:
+            raise ValueError("chunk_shortlist_size must be at least 1")
+        if 0 < self.chunk_size <= self.chunk_shortlist_size:
+            # A chunk could never shrink, wasting a whole round of map calls
+            raise ValueError("chunk_shortlist_size must be smaller than chunk_size")
+
+        # The enhanced stage only completes the recommended hotels and their
+        # closest competitors instead of the whole catalog
+        self.enhanced_top_k = config.get("enhanced_top_k", 5)
+        self.enhanced_competitors = config.get("enhanced_competitors", 2)
+
+        # Compact JSON output whose length is bounded by the number of hotels
+        self.structured_output = config.get("structured_output", False)
+        self.structured_top_k = config.get("structured_top_k", 3)
+
+    def get_basic_recommendations(
+        self,
+        user_preferences: str,
+        timeout: Optional[float] = None,
+        constraints: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Generate basic recommendations based on user preferences.
+
+        ``timeout`` is the end-to-end budget in seconds (defaults to
+        ``request_budget_seconds``); the local ranking is returned once it runs out.
+        ``constraints`` are hard filters (see ``filter_hotels``) applied before
+        any hotel reaches the prompt.
+        """
+        deadline = time.monotonic() + (timeout or self.request_budget)
+        constraints = normalize_constraints(constraints or {})
+        context = self._cache_context("basic", constraints)
+        normalized = normalize_preferences(user_preferences)
+        cached = self.preference_cache.get(context, normalized)
+        if cached is not None:
+            return cached
+
+        candidates = self._constrained_hotels(constraints)
+        if not candidates:
+            return NO_MATCH_MESSAGE
+        candidate_ids = [hotel["id"] for hotel in candidates]
+
+        # Short queries that map cleanly onto known themes and amenities are
+        # answered by the local ranker without an LLM round trip
+        if self.local_fast_path and self._is_simple_query(user_preferences, normalized):
+            result = self.local_ranker.render_basic(
+                user_preferences, candidate_ids=candidate_ids
+            )
+            self.preference_cache.put(context, normalized, result)
+            return result
+
+        candidates, degraded = self._narrow_candidates(
+            user_preferences, candidates, deadline
+        )
+
+        # Prepare context for LLM
+        hotel_summaries = [self._summarize_hotel(hotel) for hotel in candidates]
 
         # Create prompt for LLM
         system_prompt = """You are a professional travel recommendation assistant. Based on user preferences and hotel review information, recommend the most suitable hotels for the user.
@@ -60,14 +159,138 @@ Please recommend the most suitable hotels based on user preferences."""
 
         messages = [{"role": "user", "content": user_message}]
 
-        return self.llm_client.chat_completion(messages, system_prompt)
+        result, final_degraded = self._ask_llm(
+            messages,
+            system_prompt,
+            lambda: self.local_ranker.render_basic(
+                user_preferences, candidate_ids=candidate_ids
+            ),
+            deadline,
+        )
+        if not (degraded or final_degraded):
+            self.preference_cache.put(context, normalized, result)
+        return result
+
+    def get_structured_recommendations(
+        self,
+        user_preferences: str,
+        top_k: Optional[int] = None,
+        timeout: Optional[float] = None,
+        constraints: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Recommend hotels as compact JSON items instead of free-form markdown.
+
+        Each item has ``hotel_id``, ``score`` (0-1), a short ``reason`` and an
+        ``inferred`` flag. Output tokens are capped according to ``top_k``;
+        invalid answers fall back to the local ranking.
+        """
+        deadline = time.monotonic() + (timeout or self.request_budget)
+        top_k = top_k or self.structured_top_k
+        constraints = normalize_constraints(constraints or {})
+        context = self._cache_context(f"structured:{top_k}", constraints)
+        normalized = normalize_preferences(user_preferences)
+        cached = self.preference_cache.get(context, normalized)
+        if cached is not None:
+            return cached
+
+        candidates = self._constrained_hotels(constraints)
+        if not candidates:
+            return []
+        candidate_ids = [hotel["id"] for hotel in candidates]
+
+        def local_items() -> List[Dict[str, Any]]:
+            return self.local_ranker.structured_items(
+                user_preferences, top_k, candidate_ids=candidate_ids
+            )
+
+        if self.local_fast_path and self._is_simple_query(user_preferences, normalized):
+            result = local_items()
+            self.preference_cache.put(context, normalized, result)
+            return result
+
+        candidates, degraded = self._narrow_candidates(
+            user_preferences, candidates, deadline
+        )
+        hotel_summaries = [
+            dict(
+                self._summarize_hotel(hotel),
+                hotel_id=hotel["id"],
+                inferred_features=self.inferred_features[hotel["id"]]["features"],
+            )
+            for hotel in candidates
+        ]
+
+        system_prompt = f"""You are a professional travel recommendation assistant. Rank the hotels that best match the user preferences.
+
+Reply with a JSON object only, in this form:
+{{"recommendations": [{{"hotel_id": "...", "score": 0.0, "reason": "...", "inferred": false}}]}}
+
+Rules:
+- At most {top_k} items, best match first
+- "score" is the match quality between 0 and 1
+- "reason" is one short sentence based on the reviews
+- "inferred" is true when the reason relies on inferred_features"""
+
+        user_message = f"""User preferences: {user_preferences}
+
+Hotel information:
+{json.dumps(hotel_summaries, ensure_ascii=False, indent=2)}"""
+
+        messages = [{"role": "user", "content": user_message}]
+
+        result, final_degraded = self._ask_llm(
+            messages,
+            system_prompt,
+            lambda: json.dumps({"recommendations": local_items()}),
+            deadline,
+            max_tokens=STRUCTURED_OVERHEAD_TOKENS + STRUCTURED_TOKENS_PER_HOTEL * top_k,
+            json_mode=True,
+        )
+        items = self._parse_structured_items(result, candidates, top_k)
+        if not items:
+            # Invalid or truncated JSON: serve the local ranking instead
+            items = local_items()
+            final_degraded = True
+        if not (degraded or final_degraded):
+            self.preference_cache.put(context, normalized, items)
+        return items
 
     def get_enhanced_recommendations(
-        self, user_preferences: str, basic_recommendations: str
+        self,
+        user_preferences: str,
+        basic_recommendations: str,
+        timeout: Optional[float] = None,
+        constraints: Optional[Dict[str, Any]] = None,
     ) -> str:
         """Generate enhanced recommendations with information completion."""
-        # Perform information completion
-        completed_info = self._complete_missing_information()
+        deadline = time.monotonic() + (timeout or self.request_budget)
+        # Enhanced results depend on the basic list they refine
+        constraints = normalize_constraints(constraints or {})
+        normalized = normalize_preferences(user_preferences)
+        context = self._cache_context(
+            "enhanced:"
+            + hashlib.sha1(basic_recommendations.encode("utf-8")).hexdigest(),
+            constraints,
+        )
+        cached = self.preference_cache.get(context, normalized)
+        if cached is not None:
+            return cached
+
+        candidates = self._constrained_hotels(constraints)
+        if not candidates:
+            return NO_MATCH_MESSAGE
+
+        # Perform information completion for the recommended hotels only
+        scope_ids = self._enhanced_scope(
+            user_preferences, basic_recommendations, candidates
+        )
+        completed_info = self._complete_missing_information(scope_ids)
+        review_digests = {
+            self._hotels_by_id[hotel_id]["name"]: prompt_digest(
+                self.review_digests.get(hotel_id)
+            )
+            for hotel_id in scope_ids
+        }
 
         # Create enhanced prompt
         system_prompt = """You are an advanced travel recommendation assistant. Now you need to optimize the recommendation list based on completed information.
@@ -87,55 +310,640 @@ Initial recommendations:
 Completed information:
 {json.dumps(completed_info, ensure_ascii=False, indent=2)}
 
+Review digests:
+{json.dumps(review_digests, ensure_ascii=False, indent=2)}
+
 Please provide optimized recommendations based on completed information."""
 
         messages = [{"role": "user", "content": user_message}]
 
-        return self.llm_client.chat_completion(messages, system_prompt)
+        result, degraded = self._ask_llm(
+            messages,
+            system_prompt,
+            lambda: self.local_ranker.render_enhanced(
+                user_preferences, completed_info, candidate_ids=scope_ids
+            ),
+            deadline,
+        )
+        if not degraded:
+            self.preference_cache.put(context, normalized, result)
+        return result
+
+    @property
+    def vector_index(self) -> TfidfIndex:
+        """TF-IDF index, rebuilt lazily after catalog changes."""
+        if self._vector_index_dirty:
+            with self._catalog_lock:
+                if self._vector_index_dirty:
+                    self._vector_index = TfidfIndex(self.hotels)
+                    self._vector_index_dirty = False
+        return self._vector_index
+
+    def add_hotel(self, hotel: Dict[str, Any]) -> None:
+        """Add a hotel and update only the derived state it affects."""
+        for field in ("id", "name", "address", "coordinates"):
+            if field not in hotel:
+                raise ValueError(f"Hotel is missing required field: {field}")
+        self._validate_hotel_fields(hotel)
+
+        with self._catalog_lock:
+            if hotel["id"] in self._hotels_by_id:
+                raise ValueError(f"Hotel already exists: {hotel['id']}")
+            hotel.setdefault("tags", {})
+            hotel.setdefault("reviews", [])
+            self.hotels.append(hotel)
+            self._hotels_by_id[hotel["id"]] = hotel
+            self._index_hotel(hotel)
+            self._refresh_region(hotel["id"], [hotel["id"]])
+
+    def update_hotel(self, hotel_id: str, updates: Dict[str, Any]) -> None:
+        """Update hotel fields; ``tags`` are merged key by key, others replaced."""
+        with self._catalog_lock:
+            hotel = self._get_hotel_or_raise(hotel_id)
+            if "id" in updates and updates["id"] != hotel_id:
+                raise ValueError("Hotel id cannot be changed")
+            self._validate_hotel_fields(updates)
+
+            # Hotels near the old location lose this hotel as a neighbour
+            previous_region = [hotel_id] + [
+                other["id"] for other, _ in self._nearby_hotels(hotel)
+            ]
+
+            for key, value in updates.items():
+                if key == "tags":
+                    hotel.setdefault("tags", {}).update(value)
+                else:
+                    hotel[key] = value
+
+            self._index_hotel(hotel)
+            self._refresh_region(hotel_id, previous_region)
+
+    def append_reviews(self, hotel_id: str, reviews: List[Dict[str, Any]]) -> None:
+        """Append reviews to a hotel and refresh its review-derived state."""
+        self._validate_reviews(reviews)
+        with self._catalog_lock:
+            hotel = self._get_hotel_or_raise(hotel_id)
+            hotel.setdefault("reviews", []).extend(reviews)
+
+            themes_before = self.hotel_themes[hotel_id]
+            self._index_hotel(hotel)
+
+            # Similarity to neighbours only depends on review themes
+            if self.hotel_themes[hotel_id] != themes_before:
+                self._refresh_region(hotel_id, [hotel_id])
+            else:
+                self._vector_index_dirty = True
+                self.preference_cache.clear()
+
+    def get_hotel(self, hotel_id: str) -> Optional[Dict[str, Any]]:
+        """Look up a hotel by id, or None if it does not exist."""
+        return self._hotels_by_id.get(hotel_id)
+
+    def search_reviews(
+        self,
+        query: str,
+        hotel_id: Optional[str] = None,
+        min_rating: Optional[int] = None,
+        limit: int = 20,
+    ) -> List[Dict[str, Any]]:
+        """Find reviews mentioning the query terms, best matches first."""
+        terms = {stem(token) for token in tokenize(query)}
+        if not terms:
+            return []
+
+        hotels = self.hotels
+        if hotel_id is not None:
+            hotel = self._hotels_by_id.get(hotel_id)
+            hotels = [hotel] if hotel else []
+
+        matches = []
+        for hotel in hotels:
+            for review in hotel.get("reviews", []):
+                if min_rating is not None and review["rating"] < min_rating:
+                    continue
+                matched = terms.intersection(
+                    stem(token) for token in tokenize(review["text"])
+                )
+                if matched:
+                    matches.append(
+                        {
+                            "hotel_id": hotel["id"],
+                            "hotel_name": hotel["name"],
+                            "user": review["user"],
+                            "rating": review["rating"],
+                            "text": review["text"],
+                            "score": round(len(matched) / len(terms), 3),
+                        }
+                    )
+
+        matches.sort(key=lambda x: (-x["score"], -x["rating"], x["hotel_id"]))
+        return matches[:limit]
+
+    def refresh_review_digests(self, use_llm: bool = False, force: bool = False) -> int:
+        """Rebuild digests whose stored version is stale; return how many changed."""
+        refreshed = 0
+        for hotel in self.hotels:
+            hotel_id = hotel["id"]
+            stored = self._stored_digests.get(hotel_id) or {}
+            current_hash = reviews_fingerprint(hotel.get("reviews", []))
+            stale = (
+                force
+                or stored.get("reviews_hash") != current_hash
+                or (use_llm and stored.get("source") != "llm")
+            )
+            if not stale:
+                continue
+
+            themes = self.hotel_themes[hotel_id]
+            if use_llm:
+                digest = build_llm_digest(hotel, themes, self.llm_client)
+            else:
+                digest = build_extractive_digest(hotel, themes)
+            self.review_digests[hotel_id] = digest
+            refreshed += 1
+        return refreshed
+
+    def save_review_digests(self) -> None:
+        """Store the current digests next to the catalog file."""
+        save_digests(self.digest_path, self.review_digests)
+        self._stored_digests = dict(self.review_digests)
+
+    def filter_hotels(self, **constraints: Any) -> List[Dict[str, Any]]:
+        """Hotels satisfying hard constraints, in catalog order.
+
+        Supported constraints: ``min_stars``, ``max_stars``, ``min_price`` and
+        ``max_price`` (price levels as ints or ``"$$$"`` strings), ``amenities``
+        and boolean ``features`` such as ``near_mountain``. Raises ValueError
+        for unknown or malformed constraints.
+        """
+        hotel_ids = self.facet_index.filter(**normalize_constraints(constraints))
+        return [self._hotels_by_id[hotel_id] for hotel_id in hotel_ids]
+
+    def search_hotels(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """Retrieve the hotels whose reviews and tags best match a query."""
+        return [
+            {"hotel": self._hotels_by_id[hotel_id], "score": score}
+            for hotel_id, score in self.vector_index.top_k([query], k)[0]
+        ]
+
+    def score_preferences(self, preferences: List[str]) -> Dict[str, List[float]]:
+        """Score many preference strings against every hotel in one batch."""
+        scores = self.vector_index.score_batch(preferences)
+        return {
+            hotel_id: scores[:, i].tolist()
+            for i, hotel_id in enumerate(self.vector_index.hotel_ids)
+        }
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return runtime metrics such as preference cache hit rates."""
+        return {
+            "preference_cache": self.preference_cache.stats(),
+            "llm": self.llm_client.get_metrics(),
+        }
+
+    def _summarize_hotel(self, hotel: Dict) -> Dict[str, Any]:
+        """Summarize hotel information for a recommendation prompt."""
+        tags = hotel.get("tags", {})
+        return {
+            "name": hotel["name"],
+            "location": hotel["address"],
+            "star_rating": tags.get("star_rating", "N/A"),
+            "price_range": tags.get("price_range", "N/A"),
+            "amenities": tags.get("amenities", []),
+            "review_count": len(hotel.get("reviews", [])),
+            "key_themes": self.hotel_themes[hotel["id"]],
+            "review_digest": prompt_digest(self.review_digests.get(hotel["id"])),
+            "tags": tags,
+        }
+
+    def _chunk_hotels(self, hotels: List[Dict]) -> List[List[Dict]]:
+        """Split hotels into batches that each fit one prompt."""
+        if self.chunk_size > 0:
+            return [
+                hotels[i : i + self.chunk_size]
+                for i in range(0, len(hotels), self.chunk_size)
+            ]
+
+        budget = self._prompt_budget()
+        chunks = [[]]
+        used = 0
+        for hotel in hotels:
+            tokens = self._hotel_tokens(hotel)
+            if chunks[-1] and used + tokens > budget:
+                chunks.append([])
+                used = 0
+            chunks[-1].append(hotel)
+            used += tokens
+        return chunks
+
+    def _prompt_budget(self) -> int:
+        """Tokens available for hotel summaries in one prompt."""
+        return (
+            self.context_window_tokens
+            - self.llm_client.max_tokens
+            - PROMPT_OVERHEAD_TOKENS
+        )
+
+    def _hotel_tokens(self, hotel: Dict) -> int:
+        """Estimated prompt tokens of one hotel summary.
+
+        Serialized exactly as in the prompts: an element of an indented list.
+        """
+        summary = json.dumps(
+            [self._summarize_hotel(hotel)], ensure_ascii=False, indent=2
+        )
+        return len(summary) // CHARS_PER_TOKEN + 1
+
+    def _fit_to_budget(self, hotels: List[Dict]) -> List[Dict]:
+        """Longest prefix of hotels whose summaries fit one prompt."""
+        budget = self._prompt_budget()
+        used = 0
+        for count, hotel in enumerate(hotels):
+            used += self._hotel_tokens(hotel)
+            if used > budget:
+                return hotels[: max(count, 1)]
+        return hotels
+
+    def _shortlist_chunks(
+        self,
+        user_preferences: str,
+        chunks: List[List[Dict]],
+        size: int,
+        deadline: float,
+    ) -> Tuple[List[Dict], bool]:
+        """Map step: shortlist the best ``size`` hotels of every chunk in parallel."""
+        workers = max(1, min(self.chunk_parallelism, len(chunks)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(
+                executor.map(
+                    lambda chunk: self._shortlist_chunk(
+                        user_preferences, chunk, size, deadline
+                    ),
+                    chunks,
+                )
+            )
+
+        # Interleave by rank, so any prefix holds the best hotels of every chunk
+        shortlist = []
+        for rank in range(max(len(hotels) for hotels, _ in results)):
+            shortlist.extend(
+                hotels[rank] for hotels, _ in results if rank < len(hotels)
+            )
+        return shortlist, any(degraded for _, degraded in results)
+
+    def _shortlist_chunk(
+        self, user_preferences: str, chunk: List[Dict], size: int, deadline: float
+    ) -> Tuple[List[Dict], bool]:
+        """Ask the LLM for the best few hotels of one chunk."""
+        chunk_ids = [hotel["id"] for hotel in chunk]
+
+        def local_shortlist() -> str:
+            ranked = self.local_ranker.rank(user_preferences, candidate_ids=chunk_ids)
+            return "\n".join(entry["hotel"]["name"] for entry in ranked[:size])
+
+        system_prompt = f"""You are a hotel screening assistant. From the hotels provided, select up to {size} that best match the user preferences.
+
+Reply with one hotel name per line, best match first, without any other text."""
+
+        user_message = f"""User preferences: {user_preferences}
+
+Hotel information:
+{json.dumps([self._summarize_hotel(h) for h in chunk], ensure_ascii=False, indent=2)}"""
+
+        messages = [{"role": "user", "content": user_message}]
+
+        result, degraded = self._ask_llm(
+            messages,
+            system_prompt,
+            local_shortlist,
+            deadline,
+            max_tokens=40 * size + 50,
+        )
+        shortlist = self._resolve_recommended_hotels(result, chunk)[:size]
+        if not shortlist:
+            # Unparseable answer: keep the locally best hotels of the chunk
+            shortlist = self._resolve_recommended_hotels(local_shortlist(), chunk)
+            degraded = True
+        return shortlist, degraded
+
+    def _narrow_candidates(
+        self, user_preferences: str, candidates: List[Dict], deadline: float
+    ) -> Tuple[List[Dict], bool]:
+        """Shortlist candidates so they fit one prompt, reporting fallbacks."""
+        # Catalogs too large for one prompt (or larger than chunk_size) are
+        # shortlisted chunk by chunk in one parallel map step, sized so the
+        # merged shortlists fit the single final ranking call
+        chunks = self._chunk_hotels(candidates)
+        if len(chunks) <= 1:
+            return self._fit_to_budget(candidates), False
+
+        capacity = self._reduce_capacity(candidates)
+        size = max(1, min(self.chunk_shortlist_size, capacity // len(chunks)))
+        shortlist, degraded = self._shortlist_chunks(
+            user_preferences, chunks, size, deadline
+        )
+        # The interleaved shortlist is best-ranked first; never send a final
+        # prompt already known to overflow
+        return self._fit_to_budget(shortlist)[:capacity], degraded
+
+    def _reduce_capacity(self, hotels: List[Dict]) -> int:
+        """Hotels the final ranking prompt can hold."""
+        tokens = sum(self._hotel_tokens(hotel) for hotel in hotels)
+        capacity = max(1, self._prompt_budget() * len(hotels) // max(tokens, 1))
+        if self.chunk_size > 0:
+            capacity = min(capacity, self.chunk_size)
+        return capacity
+
+    def _parse_structured_items(
+        self, text: str, candidates: List[Dict], top_k: int
+    ) -> List[Dict[str, Any]]:
+        """Validate structured recommendations, dropping malformed items."""
+        parsed = parse_json_response(text)
+        if isinstance(parsed, dict):
+            parsed = parsed.get("recommendations")
+        if not isinstance(parsed, list):
+            return []
+
+        candidate_ids = {hotel["id"] for hotel in candidates}
+        items = []
+        for item in parsed:
+            if not isinstance(item, dict):
+                continue
+            hotel_id = item.get("hotel_id")
+            score = item.get("score")
+            reason = item.get("reason")
+            if hotel_id not in candidate_ids or any(
+                existing["hotel_id"] == hotel_id for existing in items
+            ):
+                continue
+            if isinstance(score, bool) or not isinstance(score, (int, float)):
+                continue
+            if not isinstance(reason, str) or not reason.strip():
+                continue
+            items.append(
+                {
+                    "hotel_id": hotel_id,
+                    "score": round(min(max(float(score), 0.0), 1.0), 3),
+                    "reason": reason.strip()[:MAX_REASON_CHARS],
+                    "inferred": item.get("inferred") is True,
+                }
+            )
+        return items[:top_k]
+
+    def _resolve_recommended_hotels(
+        self, text: str, candidates: Optional[List[Dict]] = None
+    ) -> List[Dict]:
+        """Find the hotels named in an LLM answer, in order of first mention."""
+        lowered = text.lower()
+        mentions = []
+        for hotel in candidates if candidates is not None else self.hotels:
+            positions = [
+                position
+                for position in (
+                    lowered.find(hotel["name"].lower()),
+                    lowered.find(hotel["id"].lower()),
+                )
+                if position >= 0
+            ]
+            if positions:
+                mentions.append((min(positions), hotel["id"], hotel))
+        return [hotel for _, _, hotel in sorted(mentions, key=lambda x: x[:2])]
+
+    def _ask_llm(
+        self,
+        messages: list,
+        system_prompt: str,
+        fallback: Callable[[], str],
+        deadline: float,
+        max_tokens: Optional[int] = None,
+        json_mode: bool = False,
+    ) -> Tuple[str, bool]:
+        """Query the LLM within a deadline, reporting whether it fell back."""
+        degraded = []
+
+        def local_fallback() -> str:
+            degraded.append(True)
+            return fallback()
+
+        result = self.llm_client.chat_completion(
+            messages,
+            system_prompt,
+            fallback=local_fallback,
+            deadline=deadline,
+            max_tokens=max_tokens,
+            json_mode=json_mode,
+        )
+        # Degraded answers are not cached so recovery is picked up immediately
+        return result, bool(degraded)
+
+    def _enhanced_scope(
+        self, user_preferences: str, basic_recommendations: str, candidates: List[Dict]
+    ) -> List[str]:
+        """Recommended hotels plus their closest competitors, as hotel ids.
+
+        Falls back to the local top-K when no hotel can be resolved from the
+        basic recommendation text.
+        """
+        recommended = self._resolve_recommended_hotels(
+            basic_recommendations, candidates
+        )[: self.enhanced_top_k]
+        if not recommended:
+            ranked = self.local_ranker.rank(
+                user_preferences, candidate_ids=[hotel["id"] for hotel in candidates]
+            )
+            recommended = [entry["hotel"] for entry in ranked[: self.enhanced_top_k]]
+
+        candidate_ids = {hotel["id"] for hotel in candidates}
+        scope = []
+        for hotel in recommended:
+            competitors = [
+                similar["hotel"]["id"]
+                for similar in self.similar_hotels[hotel["id"]]
+                if similar["hotel"]["id"] in candidate_ids
+            ]
+            for hotel_id in [hotel["id"]] + competitors[: self.enhanced_competitors]:
+                if hotel_id not in scope:
+                    scope.append(hotel_id)
+        return scope
+
+    def _constrained_hotels(self, constraints: Dict[str, Any]) -> List[Dict]:
+        """Candidate hotels for a request: the filtered subset or the catalog."""
+        if not constraints:
+            return self.hotels
+        return self.filter_hotels(**constraints)
+
+    def _cache_context(self, prefix: str, constraints: Dict[str, Any]) -> str:
+        """Cache context so differently constrained results never mix."""
+        if not constraints:
+            return prefix
+        return f"{prefix}:{json.dumps(constraints, sort_keys=True)}"
+
+    def _is_simple_query(self, user_preferences: str, normalized: Dict) -> bool:
+        """Check whether a query is short and fully covered by known features."""
+        has_features = normalized["themes"] or normalized["amenities"]
+        # Leftover terms are intent the local ranker cannot interpret
+        return (
+            bool(has_features)
+            and not normalized["terms"]
+            and len(user_preferences.split()) <= self.fast_path_max_words
+        )
+
+    def _compute_review_stats(self, reviews: List[Dict]) -> Dict[str, Any]:
+        """Compute review count, average rating and rating distribution."""
+        distribution = {}
+        for review in reviews:
+            distribution[review["rating"]] = distribution.get(review["rating"], 0) + 1
+        return {
+            "count": len(reviews),
+            "average_rating": (
+                sum(r["rating"] for r in reviews) / len(reviews) if reviews else 0.0
+            ),
+            "distribution": distribution,
+        }
+
+    def _validate_hotel_fields(self, fields: Dict[str, Any]) -> None:
+        """Reject malformed coordinates, tags or reviews before any mutation."""
+        if "coordinates" in fields:
+            coordinates = fields["coordinates"]
+            if not isinstance(coordinates, dict):
+                raise ValueError("Coordinates must be an object with lat and lng")
+            for axis, limit in (("lat", 90), ("lng", 180)):
+                value = coordinates.get(axis)
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    raise ValueError(f"Coordinate {axis} must be a number")
+                if not -limit <= value <= limit:
+                    raise ValueError(f"Coordinate {axis} is out of range")
+
+        if "tags" in fields:
+            tags = fields["tags"]
+            if not isinstance(tags, dict):
+                raise ValueError("Tags must be an object")
+            star_rating = tags.get("star_rating", 0)
+            if isinstance(star_rating, bool) or not isinstance(
+                star_rating, (int, float)
+            ):
+                raise ValueError("Tag star_rating must be a number")
+            price_range = tags.get("price_range", "")
+            if not isinstance(price_range, str) or set(price_range) - {"$"}:
+                raise ValueError("Tag price_range must be a string of '$' signs")
+            amenities = tags.get("amenities", [])
+            if not isinstance(amenities, list) or not all(
+                isinstance(amenity, str) for amenity in amenities
+            ):
+                raise ValueError("Tag amenities must be a list of strings")
+
+        if "reviews" in fields:
+            self._validate_reviews(fields["reviews"])
+
+    def _validate_reviews(self, reviews: Any) -> None:
+        """Reject malformed reviews before they reach the catalog."""
+        if not isinstance(reviews, list):
+            raise ValueError("Reviews must be a list")
+        for review in reviews:
+            if not isinstance(review, dict):
+                raise ValueError("Each review must be an object")
+            for field in ("user", "rating", "text"):
+                if field not in review:
+                    raise ValueError(f"Review is missing required field: {field}")
+            rating = review["rating"]
+            if isinstance(rating, bool) or not isinstance(rating, int):
+                raise ValueError("Review rating must be an integer")
+            if not 1 <= rating <= 5:
+                raise ValueError("Review rating must be between 1 and 5")
+            if not isinstance(review["text"], str):
+                raise ValueError("Review text must be a string")
+
+    def _get_hotel_or_raise(self, hotel_id: str) -> Dict[str, Any]:
+        """Look up a hotel by id."""
+        hotel = self._hotels_by_id.get(hotel_id)
+        if hotel is None:
+            raise KeyError(f"Unknown hotel: {hotel_id}")
+        return hotel
+
+    def _index_hotel(self, hotel: Dict) -> None:
+        """Refresh the state that depends only on the hotel itself."""
+        hotel_id = hotel["id"]
+        self.geo_index.add(
+            hotel_id, hotel["coordinates"]["lat"], hotel["coordinates"]["lng"]
+        )
+        self.facet_index.add(hotel)
+        self.hotel_themes[hotel_id] = self._extract_review_themes(
+            hotel.get("reviews", [])
+        )
+        self.review_stats[hotel_id] = self._compute_review_stats(
+            hotel.get("reviews", [])
+        )
+
+        # Reuse the stored digest while the reviews are unchanged; otherwise
+        # summarize locally until the offline pipeline refreshes it
+        reviews_hash = reviews_fingerprint(hotel.get("reviews", []))
+        for digest in (
+            self.review_digests.get(hotel_id),
+            self._stored_digests.get(hotel_id),
+        ):
+            if digest and digest.get("reviews_hash") == reviews_hash:
+                self.review_digests[hotel_id] = digest
+                break
+        else:
+            self.review_digests[hotel_id] = build_extractive_digest(
+                hotel, self.hotel_themes[hotel_id]
+            )
+
+    def _refresh_region(self, hotel_id: str, previous_region: List[str]) -> None:
+        """Refresh neighbour lists and inferred features around a changed hotel."""
+        hotel = self._hotels_by_id[hotel_id]
+        affected = set(previous_region)
+        affected.add(hotel_id)
+        affected.update(other["id"] for other, _ in self._nearby_hotels(hotel))
+
+        for affected_id in affected:
+            self._refresh_neighbours(affected_id)
+        for affected_id in affected:
+            self._refresh_inferred_features(affected_id)
+
+        # Global IDF weights change with every document; rebuild on next use
+        self._vector_index_dirty = True
+        self.preference_cache.clear()
+
+    def _refresh_neighbours(self, hotel_id: str) -> None:
+        """Recompute the similar-hotel list of one hotel."""
+        hotel = self._hotels_by_id[hotel_id]
+        self.similar_hotels[hotel_id] = self._find_similar_hotels(
+            hotel, hotel["coordinates"]
+        )
+
+    def _refresh_inferred_features(self, hotel_id: str) -> None:
+        """Recompute the inferred features of one hotel from its neighbours."""
+        hotel = self._hotels_by_id[hotel_id]
+        self.inferred_features[hotel_id] = self._infer_features(
+            hotel, self.similar_hotels[hotel_id]
+        )
+
+    def _nearby_hotels(self, target_hotel: Dict) -> List[Tuple[Dict, float]]:
+        """Find other hotels within 100km along with their distance."""
+        target_coords = target_hotel["coordinates"]
+        nearby = []
+        for hotel_id in self.geo_index.candidates(
+            target_coords["lat"], target_coords["lng"], 100
+        ):
+            if hotel_id == target_hotel["id"]:
+                continue
+            hotel = self._hotels_by_id[hotel_id]
+            distance = self._calculate_distance(
+                target_coords["lat"],
+                target_coords["lng"],
+                hotel["coordinates"]["lat"],
+                hotel["coordinates"]["lng"],
+            )
+            if distance < 100:
+                nearby.append((hotel, distance))
+        return sorted(nearby, key=lambda x: x[1])
 
     def _extract_review_themes(self, reviews: List[Dict]) -> List[str]:
         """Extract key themes from hotel reviews."""
         themes = []
-        theme_keywords = {
-            "mountain": ["mountain", "mountains", "hiking", "view", "peak", "trail"],
-            "river": ["river", "water", "fishing", "stream", "waterfront", "riverside"],
-            "downtown": [
-                "downtown",
-                "city center",
-                "business",
-                "transportation",
-                "metro",
-                "urban",
-            ],
-            "lake": ["lake", "swimming", "boat", "lakeside", "waterfront", "shore"],
-            "airport": [
-                "airport",
-                "shuttle",
-                "flight",
-                "terminal",
-                "transit",
-                "layover",
-            ],
-            "historic": [
-                "historic",
-                "heritage",
-                "culture",
-                "traditional",
-                "ancient",
-                "classic",
-            ],
-            "beach": ["beach", "ocean", "surf", "sea", "coastal", "sand"],
-            "countryside": [
-                "countryside",
-                "rural",
-                "farm",
-                "nature",
-                "peaceful",
-                "quiet",
-            ],
-        }
 
-        for theme, keywords in theme_keywords.items():
+        for theme, keywords in THEME_KEYWORDS.items():
             theme_count = 0
             for review in reviews:
                 review_text = review["text"].lower()
@@ -149,11 +957,17 @@ Please provide optimized recommendations based on completed information."""
 
         return themes
 
-    def _complete_missing_information(self) -> Dict[str, Any]:
+    def _complete_missing_information(
+        self, hotel_ids: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
         """Complete missing information using geographic and similarity analysis."""
         completed_info = {}
 
-        for hotel in self.hotels:
+        hotels = self.hotels
+        if hotel_ids is not None:
+            hotels = [self._hotels_by_id[hotel_id] for hotel_id in hotel_ids]
+
+        for hotel in hotels:
             hotel_id = hotel["id"]
             completed_info[hotel_id] = {
                 "name": hotel["name"],
@@ -161,12 +975,8 @@ Please provide optimized recommendations based on completed information."""
                 "confidence_scores": {},
             }
 
-            # Analyze geographic proximity
-            coords = hotel["coordinates"]
-            similar_hotels = self._find_similar_hotels(hotel, coords)
-
-            # Infer missing features based on similar hotels
-            inferred_features = self._infer_features(hotel, similar_hotels)
+            # Features inferred from geographically close, similar hotels
+            inferred_features = self.inferred_features[hotel_id]
 
             completed_info[hotel_id]["inferred_features"] = inferred_features[
                 "features"
@@ -183,31 +993,27 @@ Please provide optimized recommendations based on completed information."""
         """Find hotels with similar characteristics."""
         similar_hotels = []
 
-        for hotel in self.hotels:
-            if hotel["id"] == target_hotel["id"]:
-                continue
-
-            # Calculate geographic distance
-            distance = self._calculate_distance(
-                target_coords["lat"],
-                target_coords["lng"],
-                hotel["coordinates"]["lat"],
-                hotel["coordinates"]["lng"],
-            )
-
-            # Consider hotels within 100km as potentially similar
-            if distance < 100:
-                similarity_score = self._calculate_similarity(target_hotel, hotel)
-                if similarity_score > 0.3:
-                    similar_hotels.append(
-                        {
-                            "hotel": hotel,
-                            "distance": distance,
-                            "similarity": similarity_score,
-                        }
-                    )
+        # Consider hotels within 100km as potentially similar
+        for hotel, distance in self._nearby_hotels(target_hotel):
+            similarity_score = self._calculate_similarity(target_hotel, hotel)
+            if similarity_score > 0.3:
+                similar_hotels.append(
+                    {
+                        "hotel": hotel,
+                        "distance": distance,
+                        "similarity": similarity_score,
+                        # Stale between catalog changes; only breaks ties
+                        "text_similarity": self._vector_index.hotel_similarity(
+                            target_hotel["id"], hotel["id"]
+                        ),
+                    }
+                )
 
-        return sorted(similar_hotels, key=lambda x: x["similarity"], reverse=True)[:3]
+        # Review text similarity breaks ties between equally similar tags
+        return sorted(
+            similar_hotels,
+            key=lambda x: (-x["similarity"], -x["text_similarity"], x["hotel"]["id"]),
+        )[:3]
 
     def _calculate_distance(
         self, lat1: float, lng1: float, lat2: float, lng2: float
@@ -253,8 +1059,8 @@ Please provide optimized recommendations based on completed information."""
             score += 0.3 * (intersection / union if union > 0 else 0)
 
         # Compare review themes
-        themes1 = set(self._extract_review_themes(hotel1.get("reviews", [])))
-        themes2 = set(self._extract_review_themes(hotel2.get("reviews", [])))
+        themes1 = set(self.hotel_themes[hotel1["id"]])
+        themes2 = set(self.hotel_themes[hotel2["id"]])
         if themes1 and themes2:
             intersection = len(themes1.intersection(themes2))
             union = len(themes1.union(themes2))
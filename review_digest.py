@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Offline per-hotel review digests reused in recommendation prompts.
+
+    python review_digest.py           # refresh digests of hotels whose reviews changed
+    python review_digest.py --llm     # summarize with the configured LLM instead
+    python review_digest.py --force   # rebuild every digest
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from llm_client import parse_json_response
+from preferences import THEME_KEYWORDS
+
+POSITIVE_WORDS = (
+    "amazing beautiful best breathtaking clean convenient excellent friendly "
+    "great incredible love loved perfect stunning wonderful".split()
+)
+NEGATIVE_WORDS = (
+    "but however although expensive pricey noisy spotty small slow dated "
+    "crowded limited lacking".split()
+) + ["could be", "a bit", "only downside"]
+
+MAX_SENTENCE_LENGTH = 160
+
+
+def digest_path_for(data_path: str) -> str:
+    """Location of the digest file stored next to a catalog file."""
+    return os.path.splitext(data_path)[0] + "_digests.json"
+
+
+def reviews_fingerprint(reviews: List[Dict]) -> str:
+    """Hash of a hotel's reviews, used to detect when a digest is stale."""
+    payload = json.dumps(reviews, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def load_digests(path: str) -> Dict[str, Dict[str, Any]]:
+    """Load stored digests keyed by hotel id (empty if the file is missing)."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("digests", {})
+
+
+def save_digests(path: str, digests: Dict[str, Dict[str, Any]]) -> None:
+    """Write digests atomically so readers never see a partial file."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump({"digests": digests}, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    os.replace(temp_path, path)
+
+
+def _split_sentences(text: str) -> List[str]:
+    """Split review text into sentences without trailing punctuation."""
+    sentences = []
+    for sentence in re.split(r"(?<=[.!?])\s+", text.strip()):
+        sentence = sentence.strip().rstrip(".!?")
+        if sentence and len(sentence) <= MAX_SENTENCE_LENGTH:
+            sentences.append(sentence)
+    return sentences
+
+
+def _count_matches(sentence: str, words: List[str]) -> int:
+    """Number of listed words or phrases appearing in a sentence."""
+    lowered = sentence.lower()
+    return sum(1 for word in words if re.search(rf"\b{re.escape(word)}\b", lowered))
+
+
+def rating_skew(reviews: List[Dict]) -> Dict[str, Any]:
+    """Summarize how ratings are distributed around the average."""
+    if not reviews:
+        return {"average": None, "label": "no reviews"}
+
+    ratings = [review["rating"] for review in reviews]
+    average = sum(ratings) / len(ratings)
+    high_share = sum(1 for r in ratings if r >= 4) / len(ratings)
+    low_share = sum(1 for r in ratings if r <= 2) / len(ratings)
+
+    if high_share >= 0.8 and low_share == 0:
+        label = "consistently positive"
+    elif high_share >= 0.5 and low_share >= 0.2:
+        label = "polarized"
+    elif low_share >= 0.5:
+        label = "mostly negative"
+    else:
+        label = "mixed"
+
+    return {
+        "average": round(average, 2),
+        "high_share": round(high_share, 2),
+        "low_share": round(low_share, 2),
+        "label": label,
+    }
+
+
+def build_extractive_digest(hotel: Dict, themes: List[str]) -> Dict[str, Any]:
+    """Summarize a hotel's reviews by picking representative sentences."""
+    reviews = hotel.get("reviews", [])
+    sentences = [
+        (sentence, review["rating"])
+        for review in reviews
+        for sentence in _split_sentences(review["text"])
+    ]
+
+    # Best supporting sentence for every review theme
+    theme_highlights = {}
+    for theme in themes:
+        keywords = THEME_KEYWORDS.get(theme, [])
+        scored = [
+            (_count_matches(sentence, keywords), rating, sentence)
+            for sentence, rating in sentences
+        ]
+        scored = [entry for entry in scored if entry[0] > 0]
+        if scored:
+            scored.sort(key=lambda x: (-x[0], -x[1], len(x[2])))
+            theme_highlights[theme] = scored[0][2]
+
+    # Pros from well-rated reviews, cons from complaints in any review
+    pros = sorted(
+        (
+            (_count_matches(sentence, POSITIVE_WORDS), rating, sentence)
+            for sentence, rating in sentences
+            if rating >= 4 and _count_matches(sentence, POSITIVE_WORDS)
+        ),
+        key=lambda x: (-x[1], -x[0], len(x[2])),
+    )
+    cons = sorted(
+        (
+            (_count_matches(sentence, NEGATIVE_WORDS), rating, sentence)
+            for sentence, rating in sentences
+            if _count_matches(sentence, NEGATIVE_WORDS)
+        ),
+        key=lambda x: (x[1], -x[0], len(x[2])),
+    )
+
+    skew = rating_skew(reviews)
+    summary = f"{len(reviews)} reviews, {skew['label']}"
+    if skew["average"] is not None:
+        summary += f" (average {skew['average']}/5)"
+    if themes:
+        summary += "; guests highlight " + ", ".join(themes)
+
+    return {
+        "summary": summary,
+        "theme_highlights": theme_highlights,
+        "pros": _unique([sentence for _, _, sentence in pros])[:2],
+        "cons": _unique([sentence for _, _, sentence in cons])[:2],
+        "rating_skew": skew,
+        "source": "extractive",
+        "reviews_hash": reviews_fingerprint(reviews),
+    }
+
+
+def build_llm_digest(hotel: Dict, themes: List[str], llm_client: Any) -> Dict[str, Any]:
+    """Summarize a hotel's reviews with the LLM, falling back to extraction."""
+    extractive = build_extractive_digest(hotel, themes)
+
+    system_prompt = """You summarize hotel reviews for a recommendation system.
+
+Reply with JSON only, using the keys: "summary" (one sentence), "theme_highlights" (object mapping each given theme to one short supporting quote), "pros" (up to 2 short strings), "cons" (up to 2 short strings)."""
+
+    user_message = f"""Hotel: {hotel['name']}
+Themes: {', '.join(themes) or 'none'}
+
+Reviews:
+{json.dumps([r['text'] for r in hotel.get('reviews', [])], ensure_ascii=False, indent=2)}"""
+
+    messages = [{"role": "user", "content": user_message}]
+    # An empty fallback answer makes the extractive digest win below
+    result = llm_client.chat_completion(messages, system_prompt, fallback=lambda: "")
+
+    parsed = parse_json_response(result)
+    if not isinstance(parsed, dict) or not isinstance(parsed.get("summary"), str):
+        return extractive
+
+    # Malformed fields fall back to their extractive counterparts
+    highlights = parsed.get("theme_highlights")
+    if not _is_str_mapping(highlights):
+        highlights = extractive["theme_highlights"]
+    pros, cons = parsed.get("pros"), parsed.get("cons")
+    return {
+        "summary": parsed["summary"],
+        "theme_highlights": dict(highlights),
+        "pros": (pros if _is_str_list(pros) else extractive["pros"])[:2],
+        "cons": (cons if _is_str_list(cons) else extractive["cons"])[:2],
+        "rating_skew": extractive["rating_skew"],
+        "source": "llm",
+        "reviews_hash": extractive["reviews_hash"],
+    }
+
+
+def prompt_digest(digest: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """The part of a digest that is sent to the LLM."""
+    if digest is None:
+        return None
+    return {
+        "summary": digest["summary"],
+        "theme_highlights": digest["theme_highlights"],
+        "pros": digest["pros"],
+        "cons": digest["cons"],
+        "rating_skew": digest["rating_skew"]["label"],
+    }
+
+
+def _is_str_mapping(value: Any) -> bool:
+    """Whether a value is a dict of strings to strings."""
+    return isinstance(value, dict) and all(
+        isinstance(key, str) and isinstance(item, str) for key, item in value.items()
+    )
+
+
+def _is_str_list(value: Any) -> bool:
+    """Whether a value is a list of strings."""
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+def _unique(items: List[str]) -> List[str]:
+    """Drop duplicates while keeping order."""
+    seen = set()
+    return [item for item in items if not (item in seen or seen.add(item))]
+
+
+def main() -> None:
+    """Refresh stale digests and store them next to the catalog."""
+    parser = argparse.ArgumentParser(description="Build per-hotel review digests")
+    parser.add_argument("--data", default="hotel_data.json")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument(
+        "--llm", action="store_true", help="summarize with the configured LLM"
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="rebuild digests even if unchanged"
+    )
+    args = parser.parse_args()
+
+    from recommendation_engine import RecommendationEngine
+
+    engine = RecommendationEngine(args.data, args.config)
+    refreshed = engine.refresh_review_digests(use_llm=args.llm, force=args.force)
+    engine.save_review_digests()
+    print(
+        f"✅ {refreshed} of {len(engine.hotels)} digests refreshed, "
+        f"saved to {engine.digest_path}"
+    )
+
+
+if __name__ == "__main__":
+    main()
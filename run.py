@@ -4,26 +4,85 @@
 Simple startup script for the Travel Planner application
 """
 
+import argparse
+import importlib
+import importlib.util
 import subprocess
 import sys
 import os
+import time
+
+REQUIRED_MODULES = ["streamlit", "requests", "pandas", "numpy"]
+
+# Example requirements used to warm up the ranking path before serving traffic
+PREWARM_QUERIES = [
+    "I like hotels near mountains, with quiet environment, suitable for hiking and relaxation",
+    "I need a hotel with convenient transportation, close to city center, suitable for business activities",
+    "I want a beachfront resort with beach access and water sports facilities",
+]
 
 def check_dependencies():
-    """Check if required dependencies are installed."""
-    try:
-        import streamlit
-        import requests
-        import pandas
-        import numpy
-        print("✅ All dependencies are installed.")
-        return True
-    except ImportError as e:
-        print(f"❌ Missing dependency: {e}")
+    """Check if required dependencies are installed (without importing them)."""
+    missing = [name for name in REQUIRED_MODULES if importlib.util.find_spec(name) is None]
+    if missing:
+        print(f"❌ Missing dependency: {', '.join(missing)}")
         print("Please run: pip install -r requirements.txt")
         return False
+    print("✅ All dependencies are installed.")
+    return True
+
+def timed(timings, label, func, *args):
+    """Run func and record its wall-clock duration in milliseconds."""
+    start = time.perf_counter()
+    result = func(*args)
+    timings.append((label, (time.perf_counter() - start) * 1000))
+    return result
+
+def prewarm(include_streamlit=True):
+    """Import modules, build the engine and its indexes, and warm the caches."""
+    timings = []
+
+    # Imports, heaviest third-party modules first so project modules are measured alone
+    modules = ["numpy", "requests"]
+    if include_streamlit:
+        modules.append("streamlit")
+    modules += ["recommendation_engine", "catalog_reloader"]
+    for name in modules:
+        timed(timings, f"import {name}", importlib.import_module, name)
+
+    # Catalog load, derived state and TF-IDF index
+    from catalog_reloader import get_shared_reloader
+    engine = timed(timings, "build engine (catalog + indexes)", lambda: get_shared_reloader().current())
+
+    # First response through the same entry point as app.py, cold then warm.
+    # The API is switched off meanwhile: prewarming must not spend tokens, and
+    # local fallback answers are never cached
+    api_key = engine.llm_client.api_key
+    engine.llm_client.api_key = None
+    try:
+        timed(timings, "first response (cold)", engine.get_basic_recommendations, PREWARM_QUERIES[0])
+        for query in PREWARM_QUERIES[1:]:
+            engine.get_basic_recommendations(query)
+        timed(timings, "first response (warm)", engine.get_basic_recommendations, PREWARM_QUERIES[0])
+    finally:
+        engine.llm_client.api_key = api_key
+
+    print("⏱️  Startup breakdown:")
+    for label, elapsed in timings:
+        print(f"   {label:<36} {elapsed:8.1f} ms")
+    print(f"   {'total':<36} {sum(t for _, t in timings):8.1f} ms")
+    return timings
 
 def main():
     """Main function to start the application."""
+    parser = argparse.ArgumentParser(description="Start the Travel Planner application")
+    parser.add_argument("--prewarm", action="store_true",
+                        help="build engine indexes and caches before accepting traffic "
+                             "(runs Streamlit in this process so the warm state is reused)")
+    parser.add_argument("--prewarm-only", action="store_true",
+                        help="report the import and first-response breakdown, then exit")
+    args = parser.parse_args()
+
     print("🏨 智能旅游酒店推荐系统")
     print("=" * 50)
     
@@ -35,6 +94,11 @@ def main():
     # Check dependencies
     if not check_dependencies():
         sys.exit(1)
+
+    if args.prewarm or args.prewarm_only:
+        prewarm(include_streamlit=not args.prewarm_only)
+        if args.prewarm_only:
+            return
     
     print("🚀 Starting the application...")
     print("📱 The app will open in your default browser")
@@ -42,14 +106,21 @@ def main():
     print("⏹️  Press Ctrl+C to stop the server")
     print("-" * 50)
     
+    streamlit_args = [
+        "run", "app.py",
+        "--server.headless", "true",
+        "--server.enableCORS", "false",
+        "--server.enableXsrfProtection", "false"
+    ]
     try:
-        # Start Streamlit
-        subprocess.run([
-            sys.executable, "-m", "streamlit", "run", "app.py",
-            "--server.headless", "true",
-            "--server.enableCORS", "false",
-            "--server.enableXsrfProtection", "false"
-        ])
+        if args.prewarm:
+            # Run Streamlit in-process so app.py reuses the prewarmed engine
+            from streamlit.web import cli as stcli
+            sys.argv = ["streamlit"] + streamlit_args
+            stcli.main()
+        else:
+            # Start Streamlit
+            subprocess.run([sys.executable, "-m", "streamlit"] + streamlit_args)
     except KeyboardInterrupt:
         print("\n👋 Application stopped. Thank you for using the Travel Planner!")
     except Exception as e:
@@ -57,4 +128,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,200 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = set(
+    "a an and are as at be but by for from had has have i in is it its me "
+    "my of on or our so that the their there this to very was we were with "
+    "would you".split()
+)
+
+# Queries scored together; bounds the scratch memory of batch scoring
+QUERY_BATCH_SIZE = 256
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens without stop words."""
+    return [
+        token
+        for token in TOKEN_PATTERN.findall(text.lower())
+        if token not in STOP_WORDS and len(token) > 1
+    ]
+
+
+def stem(token: str) -> str:
+    """Fold simple plurals ("views" -> "view") so singular and plural match."""
+    if len(token) > 3 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def hotel_document(hotel: Dict) -> str:
+    """Concatenate a hotel's reviews and tags into one indexable text."""
+    tags = hotel.get("tags", {})
+    parts = [hotel.get("name", "")]
+    parts.extend(amenity.replace("_", " ") for amenity in tags.get("amenities", []))
+    for key, value in tags.items():
+        if key not in ["star_rating", "price_range", "amenities"] and value is True:
+            parts.append(key.replace("_", " "))
+    parts.extend(review["text"] for review in hotel.get("reviews", []))
+    return " ".join(parts)
+
+
+class TfidfIndex:
+    """Sparse TF-IDF index over hotels stored as NumPy CSR arrays."""
+
+    def __init__(self, hotels: List[Dict]):
+        """Build the index from the hotel catalog."""
+        self.hotel_ids = [hotel["id"] for hotel in hotels]
+        self._positions = {hotel_id: i for i, hotel_id in enumerate(self.hotel_ids)}
+
+        documents = [tokenize(hotel_document(hotel)) for hotel in hotels]
+
+        # Vocabulary and document frequencies
+        self.vocabulary: Dict[str, int] = {}
+        doc_freq: List[int] = []
+        for tokens in documents:
+            for token in set(tokens):
+                if token not in self.vocabulary:
+                    self.vocabulary[token] = len(self.vocabulary)
+                    doc_freq.append(0)
+                doc_freq[self.vocabulary[token]] += 1
+
+        n_docs = len(documents)
+        doc_freq_array = np.asarray(doc_freq, dtype=np.float64)
+        self.idf = np.log((1 + n_docs) / (1 + doc_freq_array)) + 1
+
+        # CSR matrix of L2-normalized TF-IDF rows, one row per hotel
+        indptr = [0]
+        indices: List[int] = []
+        data: List[float] = []
+        for tokens in documents:
+            counts: Dict[int, int] = {}
+            for token in tokens:
+                column = self.vocabulary[token]
+                counts[column] = counts.get(column, 0) + 1
+            columns = sorted(counts)
+            row = np.asarray([counts[c] for c in columns], dtype=np.float64)
+            row = (1 + np.log(row)) * self.idf[columns] if columns else row
+            norm = np.linalg.norm(row)
+            if norm > 0:
+                row = row / norm
+            indices.extend(columns)
+            data.extend(row.tolist())
+            indptr.append(len(indices))
+
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.data = np.asarray(data, dtype=np.float64)
+
+        # The same matrix by column (CSC), so a query only touches the hotels
+        # containing one of its few terms
+        order = np.argsort(self.indices, kind="stable")
+        rows = np.repeat(
+            np.arange(len(self.hotel_ids), dtype=np.int64), np.diff(self.indptr)
+        )
+        self.column_rows = rows[order]
+        self.column_data = self.data[order]
+        self.column_indptr = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(self.indices, minlength=len(self.vocabulary)),
+            out=self.column_indptr[1:],
+        )
+
+    def vectorize(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Turn a query text into sparse (columns, values) TF-IDF weights."""
+        counts: Dict[int, int] = {}
+        for token in tokenize(text):
+            column = self.vocabulary.get(token)
+            if column is not None:
+                counts[column] = counts.get(column, 0) + 1
+        columns = np.asarray(sorted(counts), dtype=np.int64)
+        values = np.asarray([counts[c] for c in columns], dtype=np.float64)
+        values = (1 + np.log(values)) * self.idf[columns] if len(columns) else values
+        norm = np.linalg.norm(values)
+        return columns, values / norm if norm > 0 else values
+
+    def score_batch(self, texts: List[str]) -> np.ndarray:
+        """Cosine scores of many query texts against all hotels (queries x hotels)."""
+        scores = np.zeros((len(texts), len(self.hotel_ids)), dtype=np.float64)
+        for start in range(0, len(texts), QUERY_BATCH_SIZE):
+            batch = [
+                self.vectorize(text) for text in texts[start : start + QUERY_BATCH_SIZE]
+            ]
+            scores[start : start + len(batch)] = self._score_vectors(batch)
+        return scores
+
+    def top_k(self, texts: List[str], k: int = 5) -> List[List[Tuple[str, float]]]:
+        """Return the k best matching hotel ids with scores for each query."""
+        k = min(k, len(self.hotel_ids))
+        results = []
+        for start in range(0, len(texts), QUERY_BATCH_SIZE):
+            batch = [
+                self.vectorize(text) for text in texts[start : start + QUERY_BATCH_SIZE]
+            ]
+            for row in self._score_vectors(batch):
+                if k <= 0:
+                    results.append([])
+                    continue
+                best = np.argpartition(-row, k - 1)[:k]
+                best = best[np.argsort(-row[best], kind="stable")]
+                results.append([(self.hotel_ids[i], float(row[i])) for i in best])
+        return results
+
+    def hotel_similarity(self, hotel_id1: str, hotel_id2: str) -> float:
+        """Cosine similarity between two indexed hotels."""
+        pos1 = self._positions.get(hotel_id1)
+        pos2 = self._positions.get(hotel_id2)
+        if pos1 is None or pos2 is None:
+            return 0.0
+        row1 = self._row(pos1)
+        row2 = self._row(pos2)
+        common, idx1, idx2 = np.intersect1d(
+            row1[0], row2[0], assume_unique=True, return_indices=True
+        )
+        return float(np.dot(row1[1][idx1], row2[1][idx2])) if len(common) else 0.0
+
+    def similarity_matrix(self, hotel_ids: Optional[List[str]] = None) -> np.ndarray:
+        """Pairwise cosine similarities between hotels (offline batch scoring)."""
+        positions = (
+            [self._positions[h] for h in hotel_ids]
+            if hotel_ids is not None
+            else list(range(len(self.hotel_ids)))
+        )
+        matrix = np.zeros((len(positions), len(positions)), dtype=np.float64)
+        for start in range(0, len(positions), QUERY_BATCH_SIZE):
+            batch = positions[start : start + QUERY_BATCH_SIZE]
+            scores = self._score_vectors([self._row(pos) for pos in batch])
+            matrix[start : start + len(batch)] = scores[:, positions]
+        return matrix
+
+    def _score_vectors(
+        self, vectors: List[Tuple[np.ndarray, np.ndarray]]
+    ) -> np.ndarray:
+        """Score sparse query vectors against all hotels via the column index."""
+        n_hotels = len(self.hotel_ids)
+        targets = []
+        weights = []
+        for i, (columns, values) in enumerate(vectors):
+            for column, value in zip(columns, values):
+                start, end = self.column_indptr[column], self.column_indptr[column + 1]
+                targets.append(self.column_rows[start:end] + i * n_hotels)
+                weights.append(self.column_data[start:end] * value)
+        if not targets:
+            return np.zeros((len(vectors), n_hotels), dtype=np.float64)
+        flat = np.bincount(
+            np.concatenate(targets),
+            weights=np.concatenate(weights),
+            minlength=len(vectors) * n_hotels,
+        )
+        return flat.reshape(len(vectors), n_hotels)
+
+    def _row(self, position: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the (columns, values) of one CSR row."""
+        start, end = self.indptr[position], self.indptr[position + 1]
+        return self.indices[start:end], self.data[start:end]